@@ -0,0 +1,141 @@
+import numpy as np
+import pandas as pd
+from typing import Dict, Iterator, List, Optional, Tuple, Union
+
+from records import AttemptRecord, to_columns
+
+ATTEMPT_COLUMNS = ['user_id', 'user_name', 'group_id', 'quiz_id', 'grade']
+
+QUANTILES = (0.25, 0.75, 0.9)
+
+# Русские заголовки колонок для листов Excel
+COLUMN_TITLES = {
+    'group_id': 'ID группы',
+    'group_name': 'Группа',
+    'quiz_id': 'ID теста',
+    'user_id': 'ID студента',
+    'user_name': 'ФИО студента',
+    'students': 'Студентов',
+    'attempts': 'Попыток',
+    'mean': 'Среднее',
+    'median': 'Медиана',
+    'min': 'Мин.',
+    'max': 'Макс.',
+    'p25': '25-й перцентиль',
+    'p75': '75-й перцентиль',
+    'p90': '90-й перцентиль',
+    'pass_rate': 'Доля сдавших',
+    'best': 'Лучшая оценка',
+}
+
+
+class AttemptAnalytics:
+    """
+    Статистика по попыткам тестов на колоночном DataFrame: одна строка — одна
+    завершенная попытка. Студенты без попыток хранятся строкой с grade = NaN,
+    чтобы учитываться в числе студентов и доле сдавших
+    """
+
+    def __init__(self, frame: pd.DataFrame, group_names: Optional[Dict[int, str]] = None):
+        self.frame = frame
+        self.group_names = group_names or {}
+
+    @classmethod
+    def from_records(cls, records: List[Union[AttemptRecord, Dict]],
+                     group_names: Optional[Dict[int, str]] = None) -> 'AttemptAnalytics':
+        frame = pd.DataFrame(to_columns(records, ATTEMPT_COLUMNS), columns=ATTEMPT_COLUMNS)
+        frame['grade'] = pd.to_numeric(frame['grade'], errors='coerce')
+        return cls(frame, group_names)
+
+    def _describe(self, keys: List[str], pass_grade: Optional[float] = None) -> pd.DataFrame:
+        """
+        Агрегаты оценок по ключам группировки, посчитанные векторно
+        """
+        grouped = self.frame.groupby(keys)['grade']
+        stats = grouped.agg(attempts='count', mean='mean', median='median', min='min', max='max')
+        stats.insert(0, 'students', self.frame.groupby(keys)['user_id'].nunique())
+
+        quantiles = grouped.quantile(list(QUANTILES)).unstack()
+        quantiles.columns = [f"p{int(q * 100)}" for q in quantiles.columns]
+        stats = stats.join(quantiles)
+
+        if pass_grade is not None:
+            best = self.frame.groupby(keys + ['user_id'])['grade'].max()
+            stats['pass_rate'] = (best >= pass_grade).groupby(level=keys).mean()
+
+        return stats.reset_index()
+
+    def quiz_summary(self, pass_grade: Optional[float] = None) -> pd.DataFrame:
+        """
+        Статистика по каждому тесту
+        """
+        return self._describe(['quiz_id'], pass_grade)
+
+    def group_summary(self, pass_grade: Optional[float] = None) -> pd.DataFrame:
+        """
+        Статистика по группе и тесту
+        """
+        summary = self._describe(['group_id', 'quiz_id'], pass_grade)
+        summary.insert(1, 'group_name', summary['group_id'].map(self.group_names))
+        return summary
+
+    def student_summary(self) -> pd.DataFrame:
+        """
+        Число попыток, лучшая и средняя оценка каждого студента по каждому тесту
+        """
+        return (self.frame
+                .groupby(['group_id', 'user_id', 'user_name', 'quiz_id'])['grade']
+                .agg(attempts='count', best='max', mean='mean')
+                .reset_index())
+
+    def histogram(self, bins: int = 10) -> pd.DataFrame:
+        """
+        Распределение лучших оценок студентов по тестам (число студентов в интервале)
+        """
+        best = self.frame.groupby(['quiz_id', 'user_id'])['grade'].max().dropna()
+        if best.empty:
+            return pd.DataFrame()
+        edges = np.linspace(best.min(), best.max(), bins + 1) if best.max() > best.min() else bins
+        intervals = pd.cut(best, bins=edges, include_lowest=True)
+        table = pd.crosstab(best.index.get_level_values('quiz_id'), intervals)
+        table.index.name = 'quiz_id'
+        table.columns = [f"{interval.left:g}–{interval.right:g}" for interval in table.columns]
+        return table.reset_index()
+
+    def summary_tables(self, pass_grade: Optional[float] = None, bins: int = 10) -> Dict[str, pd.DataFrame]:
+        """
+        Таблицы статистики для колоночных форматов: {имя таблицы: DataFrame}
+        """
+        return {
+            'quiz_stats': self.quiz_summary(pass_grade),
+            'group_stats': self.group_summary(pass_grade),
+            'histogram': self.histogram(bins),
+        }
+
+    def summary_sheets(self, pass_grade: Optional[float] = None,
+                       bins: int = 10) -> List[Tuple[str, Iterator[List]]]:
+        """
+        Листы для экспорта в Excel: (название, генератор строк с заголовком)
+        """
+        return [
+            ("Статистика по тестам", frame_rows(self.quiz_summary(pass_grade))),
+            ("Статистика по группам", frame_rows(self.group_summary(pass_grade))),
+            ("Распределение оценок", frame_rows(self.histogram(bins))),
+        ]
+
+
+def frame_rows(frame: pd.DataFrame) -> Iterator[List]:
+    """
+    Строки DataFrame для записи в лист: заголовок, затем значения (NaN -> пусто)
+    """
+    yield [COLUMN_TITLES.get(column, column) for column in frame.columns]
+    for row in frame.itertuples(index=False, name=None):
+        yield [_cell_value(value) for value in row]
+
+
+def _cell_value(value):
+    if isinstance(value, np.generic):
+        value = value.item()
+    if isinstance(value, float):
+        return None if np.isnan(value) else round(value, 4)
+    return value
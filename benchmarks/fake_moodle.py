@@ -0,0 +1,263 @@
+import json
+import random
+import socket
+import threading
+import time
+from collections import Counter
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from typing import Dict, List, Optional
+from urllib.parse import urlparse, parse_qs
+
+
+class SyntheticMoodle:
+    """
+    Синтетические данные Moodle: курсы, группы, студенты, тесты, попытки и оценки
+    """
+
+    def __init__(self, courses: int = 1, groups_per_course: int = 2, students_per_group: int = 30,
+                 quizzes_per_course: int = 4, grade_items_per_course: int = 20,
+                 attempts_per_quiz: int = 2, padding: int = 0, seed: int = 42, teachers: int = 1):
+        rnd = random.Random(seed)
+        self.padding = 'x' * padding
+        self.teacher_id = 2
+        self.courses = {}
+        self.groups = {}
+        self.users = {}
+        # Преподаватели 2, 3, ...; курс c ведет преподаватель с номером (c - 1) % teachers
+        self.teacher_ids = [self.teacher_id + t for t in range(teachers)]
+        for teacher_id in self.teacher_ids:
+            self.users[teacher_id] = {'id': teacher_id, 'firstname': 'Преподаватель', 'lastname': str(teacher_id),
+                                      'email': f'teacher{teacher_id}@example.com'}
+        self.quizzes = {}
+        self.attempts = {}
+
+        next_user_id = max(100, self.teacher_ids[-1] + 1)
+        for c in range(courses):
+            course_id = c + 1
+            start = 1704067200 + c * 86400
+            self.courses[course_id] = {
+                'id': course_id,
+                'fullname': f'Курс {course_id}',
+                'shortname': f'C{course_id}',
+                'startdate': start,
+                'enddate': start + 120 * 86400,
+            }
+
+            quiz_ids = []
+            for q in range(quizzes_per_course):
+                quiz_id = course_id * 1000 + q + 1
+                quiz_ids.append(quiz_id)
+                self.quizzes[quiz_id] = {
+                    'id': quiz_id,
+                    'course': course_id,
+                    'name': f'Тест {quiz_id}',
+                    'grademethod': 1,
+                    'grade': 100.0,
+                    'sumgrades': 10.0,
+                    'timeclose': 0,
+                }
+
+            course_students = []
+            for g in range(groups_per_course):
+                group_id = course_id * 100 + g + 1
+                members = []
+                for _ in range(students_per_group):
+                    user_id = next_user_id
+                    next_user_id += 1
+                    members.append(user_id)
+                    self.users[user_id] = {
+                        'id': user_id,
+                        'firstname': f'Имя{user_id}',
+                        'lastname': f'Фамилия{user_id}',
+                        'email': f'student{user_id}@example.com',
+                    }
+                self.groups[group_id] = {'id': group_id, 'courseid': course_id,
+                                         'name': f'Группа {group_id}', 'members': members}
+                course_students.extend(members)
+
+            for user_id in course_students:
+                for quiz_id in quiz_ids:
+                    self.attempts[(user_id, quiz_id)] = [
+                        {
+                            'id': len(self.attempts) * 10 + a,
+                            'quiz': quiz_id,
+                            'userid': user_id,
+                            'attempt': a + 1,
+                            'state': 'finished',
+                            'sumgrades': round(rnd.uniform(0, 10), 5),
+                            'timefinish': start + a * 3600,
+                        }
+                        for a in range(attempts_per_quiz)
+                    ]
+
+            self.courses[course_id]['quiz_ids'] = quiz_ids
+            self.courses[course_id]['students'] = course_students
+            self.courses[course_id]['grade_items'] = [
+                {'id': course_id * 10000 + i, 'itemname': f'Элемент {i}', 'itemtype': 'manual',
+                 'itemmodule': None, 'iteminstance': 0, 'grademax': 100}
+                for i in range(grade_items_per_course)
+            ]
+
+    def _array(self, params: Dict, name: str) -> List[str]:
+        values = []
+        i = 0
+        while f'{name}[{i}]' in params:
+            values.append(params[f'{name}[{i}]'])
+            i += 1
+        return values
+
+    def _user_grades(self, course: Dict, user_id: int) -> Dict:
+        items = []
+        for item in course['grade_items']:
+            value = (user_id * 7 + item['id']) % 101
+            items.append(dict(item, graderaw=float(value), gradeformatted=f'{value},00',
+                              percentageformatted=f'{value},00 %', gradedatesubmitted=course['startdate'],
+                              gradedatemodified=course['startdate'], padding=self.padding))
+        for quiz_id in course['quiz_ids']:
+            quiz = self.quizzes[quiz_id]
+            best = max(a['sumgrades'] for a in self.attempts[(user_id, quiz_id)])
+            graderaw = best * quiz['grade'] / quiz['sumgrades']
+            items.append({'id': 900000 + quiz_id, 'itemname': quiz['name'], 'itemtype': 'mod', 'itemmodule': 'quiz',
+                          'iteminstance': quiz_id, 'grademax': quiz['grade'], 'graderaw': graderaw,
+                          'gradeformatted': f'{graderaw:.2f}', 'percentageformatted': f'{graderaw:.2f} %',
+                          'gradedatesubmitted': course['startdate'], 'gradedatemodified': course['startdate'],
+                          'padding': self.padding})
+        user = self.users[user_id]
+        return {'userid': user_id, 'userfullname': f"{user['firstname']} {user['lastname']}", 'gradeitems': items}
+
+    def handle(self, function: str, params: Dict):
+        if function == 'core_user_get_users':
+            email = params.get('criteria[0][value]')
+            return {'users': [u for u in self.users.values() if u['email'] == email], 'warnings': []}
+
+        if function == 'core_user_get_users_by_field':
+            values = self._array(params, 'values')
+            if params.get('field') == 'email':
+                emails = {v.lower() for v in values}
+                return [dict(u, padding=self.padding) for u in self.users.values() if u['email'] in emails]
+            ids = {int(v) for v in values}
+            return [dict(self.users[i], padding=self.padding) for i in sorted(ids) if i in self.users]
+
+        if function == 'core_enrol_get_users_courses':
+            user_id = int(params['userid'])
+            courses = self.courses.values()
+            if user_id in self.teacher_ids:
+                position = self.teacher_ids.index(user_id)
+                courses = [c for c in courses if (c['id'] - 1) % len(self.teacher_ids) == position]
+            return [{k: v for k, v in c.items() if k not in ('quiz_ids', 'students', 'grade_items')}
+                    for c in courses]
+
+        if function == 'core_group_get_group_members':
+            return [{'groupid': int(g), 'userids': self.groups[int(g)]['members']}
+                    for g in self._array(params, 'groupids') if int(g) in self.groups]
+
+        if function == 'core_group_get_groups':
+            return [{'id': g['id'], 'courseid': g['courseid'], 'name': g['name']}
+                    for g in (self.groups.get(int(i)) for i in self._array(params, 'groupids')) if g]
+
+        if function == 'core_group_get_course_groups':
+            return [{'id': g['id'], 'courseid': g['courseid'], 'name': g['name']}
+                    for g in self.groups.values() if g['courseid'] == int(params['courseid'])]
+
+        if function == 'mod_quiz_get_quizzes_by_courses':
+            ids = {int(v) for v in self._array(params, 'courseids')}
+            return {'quizzes': [q for q in self.quizzes.values() if q['course'] in ids], 'warnings': []}
+
+        if function == 'mod_quiz_get_user_attempts':
+            key = (int(params['userid']), int(params['quizid']))
+            return {'attempts': [dict(a, padding=self.padding) for a in self.attempts.get(key, [])],
+                    'warnings': []}
+
+        if function == 'gradereport_user_get_grade_items':
+            course = self.courses.get(int(params['courseid']))
+            if course is None:
+                return {'exception': 'invalid_parameter_exception', 'message': 'Курс не найден'}
+            students = course['students']
+            if params.get('groupid'):
+                students = self.groups[int(params['groupid'])]['members']
+            return {'usergrades': [self._user_grades(course, u) for u in students], 'warnings': []}
+
+        return {'exception': 'webservice_access_exception', 'message': f'Неизвестная функция {function}'}
+
+
+class FakeMoodleServer:
+    """
+    Локальная замена /webservice/rest/server.php с настраиваемой задержкой ответа
+    """
+
+    def __init__(self, data: SyntheticMoodle, latency: float = 0.0):
+        self.data = data
+        self.latency = latency
+        self.requests = Counter()
+        self._lock = threading.Lock()
+        self._server: Optional[ThreadingHTTPServer] = None
+
+    @property
+    def url(self) -> str:
+        return f'http://127.0.0.1:{self._server.server_address[1]}'
+
+    @property
+    def total_requests(self) -> int:
+        return sum(self.requests.values())
+
+    def reset_counters(self) -> None:
+        with self._lock:
+            self.requests.clear()
+
+    def _make_handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def setup(self):
+                super().setup()
+                # Без Nagle заголовки и тело не ждут задержанного ACK на keep-alive соединении
+                self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+            def log_message(self, *args):
+                pass
+
+            def _respond(self, params: Dict) -> None:
+                if urlparse(self.path).path != '/webservice/rest/server.php':
+                    self.send_error(404)
+                    return
+                function = params.get('wsfunction', '')
+                with server._lock:
+                    server.requests[function] += 1
+                if server.latency:
+                    time.sleep(server.latency)
+                body = json.dumps(server.data.handle(function, params), ensure_ascii=False).encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json; charset=utf-8')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_GET(self):
+                query = parse_qs(urlparse(self.path).query)
+                self._respond({k: v[0] for k, v in query.items()})
+
+            def do_POST(self):
+                length = int(self.headers.get('Content-Length', 0))
+                form = parse_qs(self.rfile.read(length).decode('utf-8'))
+                self._respond({k: v[0] for k, v in form.items()})
+
+        return Handler
+
+    def start(self) -> 'FakeMoodleServer':
+        self._server = ThreadingHTTPServer(('127.0.0.1', 0), self._make_handler())
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self) -> None:
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+
+    def __enter__(self) -> 'FakeMoodleServer':
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
@@ -0,0 +1,123 @@
+"""
+Офлайн-бенчмарки MoodleClient и экспорта в Excel на локальном фейковом сервере Moodle.
+
+Запуск из корня проекта:
+    python -m benchmarks.run_benchmarks --sizes 10 50 200 --latency 0.005
+"""
+import argparse
+import gc
+import os
+import tempfile
+import time
+import tracemalloc
+from typing import Callable, Dict, List, Optional
+
+from moodle_client import MoodleClient
+from exporters import export_to_excel, zachet_export_to_excel
+from benchmarks.fake_moodle import SyntheticMoodle, FakeMoodleServer
+
+
+def measure(server: FakeMoodleServer, func: Callable, with_memory: bool = True,
+            reset: Optional[Callable] = None) -> Dict:
+    """
+    Время выполнения и число запросов к серверу; пиковая память — отдельным прогоном
+    под tracemalloc, чтобы трассировка не искажала время. reset вызывается перед
+    каждым прогоном, чтобы состояние клиента не переходило между сценариями
+    """
+    if reset is not None:
+        reset()
+    gc.collect()
+    server.reset_counters()
+    started = time.perf_counter()
+    func()
+    wall = time.perf_counter() - started
+    requests_count = server.total_requests
+
+    peak = None
+    if with_memory:
+        if reset is not None:
+            reset()
+        gc.collect()
+        tracemalloc.start()
+        func()
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+    return {'wall': wall, 'requests': requests_count, 'peak': peak}
+
+
+def benchmark_cases(client: MoodleClient, data: SyntheticMoodle, workdir: str) -> Dict[str, Callable]:
+    course_id = next(iter(data.courses))
+    group_id = next(g for g, group in data.groups.items() if group['courseid'] == course_id)
+    quiz_ids = data.courses[course_id]['quiz_ids']
+    start, end = '2020-01-01', '2030-12-31'
+
+    interim = client.track_interim_assessment(course_id, start, end)
+    zachet = client.analyze_attempts_results(quiz_ids, group_id, course_id)
+    courses = client.get_teacher_courses(data.teacher_id, start, end)
+
+    return {
+        'analyze_attempts_results[sequential]':
+            lambda: client.analyze_attempts_results(quiz_ids, group_id, course_id),
+        'analyze_attempts_results[threads]':
+            lambda: client.analyze_attempts_results(quiz_ids, group_id, course_id, mode='threads'),
+        'analyze_attempts_results[bulk]':
+            lambda: client.analyze_attempts_results(quiz_ids, group_id, course_id, strategy='bulk'),
+        'track_interim_assessment':
+            lambda: client.track_interim_assessment(course_id, start, end),
+        'get_teacher_courses':
+            lambda: client.get_teacher_courses(data.teacher_id, start, end),
+        'get_teachers_courses[threads]':
+            lambda: client.get_teachers_courses(data.teacher_ids, start, end),
+        'export_to_excel[interim]':
+            lambda: export_to_excel(interim, os.path.join(workdir, 'interim.xlsx')),
+        'export_to_excel[interim, streaming]':
+            lambda: export_to_excel(interim, os.path.join(workdir, 'interim_stream.xlsx'), streaming=True),
+        'export_to_excel[courses]':
+            lambda: export_to_excel(courses, os.path.join(workdir, 'courses.xlsx')),
+        'zachet_export_to_excel':
+            lambda: zachet_export_to_excel(zachet, os.path.join(workdir, 'zachet.xlsx'), 'Группа'),
+    }
+
+
+def run(sizes: List[int], latency: float, quizzes: int, grade_items: int, padding: int,
+        with_memory: bool) -> List[Dict]:
+    rows = []
+    for size in sizes:
+        data = SyntheticMoodle(students_per_group=size, quizzes_per_course=quizzes,
+                               grade_items_per_course=grade_items, padding=padding)
+        with FakeMoodleServer(data, latency=latency) as server, \
+                tempfile.TemporaryDirectory() as workdir:
+            client = MoodleClient(url=server.url, token='benchmark')
+            for name, func in benchmark_cases(client, data, workdir).items():
+                # Метаданные из памяти клиента (LRUMemo) сбрасываются, чтобы считались все запросы сценария
+                result = measure(server, func, with_memory, reset=client.memo.invalidate)
+                result.update({'case': name, 'size': size})
+                rows.append(result)
+    return rows
+
+
+def print_report(rows: List[Dict]) -> None:
+    print(f"\n{'Сценарий':<40} {'Студентов':>9} {'Время, с':>9} {'Запросов':>9} {'Пик, МБ':>9}")
+    for row in rows:
+        peak = f"{row['peak'] / 2 ** 20:.2f}" if row['peak'] is not None else '-'
+        print(f"{row['case']:<40} {row['size']:>9} {row['wall']:>9.3f} {row['requests']:>9} {peak:>9}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Бенчмарки MoodleClient на фейковом сервере Moodle")
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10, 50, 200],
+                        help="Размеры группы (число студентов)")
+    parser.add_argument('--latency', type=float, default=0.005, help="Задержка ответа сервера, с")
+    parser.add_argument('--quizzes', type=int, default=4, help="Тестов в курсе")
+    parser.add_argument('--grade-items', type=int, default=20, help="Элементов оценивания в курсе")
+    parser.add_argument('--padding', type=int, default=0, help="Дополнительные байты в каждой записи ответа")
+    parser.add_argument('--no-memory', action='store_true', help="Не измерять пиковую память")
+    args = parser.parse_args()
+
+    rows = run(args.sizes, args.latency, args.quizzes, args.grade_items, args.padding, not args.no_memory)
+    print_report(rows)
+
+
+if __name__ == '__main__':
+    main()
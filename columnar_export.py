@@ -0,0 +1,132 @@
+"""
+Экспорт отчетов в колоночные форматы (CSV, Parquet, Arrow IPC) напрямую из
+DataFrame, без построения ячеек openpyxl.
+
+Parquet и Arrow требуют необязательный пакет pyarrow.
+"""
+import os
+import numpy as np
+import pandas as pd
+from typing import Dict, List, Optional, Union, Tuple, TYPE_CHECKING
+
+from records import to_columns, failed_quizzes_text
+from report_formats import detect_format
+
+if TYPE_CHECKING:
+    from attempt_analytics import AttemptAnalytics
+
+COLUMNAR_FORMATS = ('csv', 'parquet', 'arrow')
+
+
+def _interim_tables(data: Dict) -> Dict[str, pd.DataFrame]:
+    matrix = data.get('matrix')
+    if matrix is not None:
+        items = pd.DataFrame(data['interim_items'], columns=['id', 'name', 'type', 'max_grade', 'date'])
+        # Координаты всех выставленных оценок берутся из маски матрицы одним вызовом
+        rows, cols = np.nonzero(matrix.present)
+        item_frame = pd.DataFrame(matrix.items)
+        grades = pd.DataFrame({
+            'user_id': np.asarray(matrix.user_ids)[rows],
+            'user_name': np.asarray(matrix.user_names, dtype=object)[rows],
+            'item_id': item_frame['id'].to_numpy()[cols],
+            'item': item_frame['name'].to_numpy()[cols],
+            'grade': matrix.grades[rows, cols],
+            'percentage': matrix.percentages[rows, cols],
+            'raw_grade': matrix.raw[rows, cols],
+            'max_grade': item_frame['max_grade'].to_numpy()[cols],
+            'date': item_frame['date'].to_numpy()[cols],
+        })
+    else:
+        records = [
+            (student['userid'], student['userfullname'], grade['item_id'], grade['item'],
+             grade['grade'], grade['percentage'], grade.get('raw_grade'))
+            for student in data['students_grades']
+            for grade in student['grades']
+        ]
+        grades = pd.DataFrame.from_records(
+            records, columns=['user_id', 'user_name', 'item_id', 'item', 'grade', 'percentage', 'raw_grade']
+        )
+        grades['raw_grade'] = pd.to_numeric(grades['raw_grade'], errors='coerce')
+        # В потоковом режиме каталог заполнен только после чтения всех студентов.
+        # Элементы сопоставляются по id: названия в курсе могут повторяться
+        items = pd.DataFrame(data['interim_items'], columns=['id', 'name', 'type', 'max_grade', 'date'])
+        lookup = items.drop_duplicates('id').set_index('id')
+        grades['max_grade'] = grades['item_id'].map(lookup['max_grade'])
+        grades['date'] = grades['item_id'].map(lookup['date'])
+
+    return {'grades': grades, 'items': items}
+
+
+def report_tables(data: Union[Tuple[List[Dict], int], Dict, List[Dict]],
+                  group_name: Optional[str] = None) -> Dict[str, pd.DataFrame]:
+    """
+    Колоночное представление отчета: первая таблица основная, остальные дополнительные.
+    Поддерживаются данные get_teacher_courses, track_interim_assessment
+    и analyze_attempts_results
+    """
+    if isinstance(data, tuple) and len(data) == 2:
+        courses, _ = data
+        columns = ['id', 'fullname', 'startdate', 'enddate']
+        return {'courses': pd.DataFrame(to_columns(courses, columns), columns=columns)}
+
+    if isinstance(data, dict) and 'students_grades' in data:
+        return _interim_tables(data)
+
+    if isinstance(data, list):
+        columns = ['user_name', 'best_grade']
+        results = pd.DataFrame(to_columns(data, columns), columns=columns)
+        results.insert(1, 'group', group_name)
+        results['failed_quiz_ids'] = [failed_quizzes_text(result) for result in data]
+        return {'results': results}
+
+    raise ValueError("Неподдерживаемый формат данных")
+
+
+def _require_pyarrow(file_format: str) -> None:
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        raise ImportError(f"Для формата {file_format} нужен пакет pyarrow (pip install pyarrow)")
+
+
+def write_table(frame: pd.DataFrame, filename: str, file_format: str) -> None:
+    if file_format == 'csv':
+        frame.to_csv(filename, index=False, encoding='utf-8-sig')
+    elif file_format == 'parquet':
+        _require_pyarrow(file_format)
+        frame.to_parquet(filename, index=False, engine='pyarrow')
+    elif file_format == 'arrow':
+        _require_pyarrow(file_format)
+        frame.to_feather(filename)
+    else:
+        raise ValueError(f"Неизвестный колоночный формат: {file_format}. "
+                         f"Допустимые: {', '.join(COLUMNAR_FORMATS)}")
+
+
+def export_columnar(data: Union[Tuple[List[Dict], int], Dict, List[Dict]], filename: str,
+                    file_format: Optional[str] = None, group_name: Optional[str] = None,
+                    analytics: Optional['AttemptAnalytics'] = None,
+                    pass_grade: Optional[float] = None) -> List[str]:
+    """
+    Записывает отчет в CSV/Parquet/Arrow. Основная таблица пишется в filename,
+    дополнительные — рядом, в файлы вида <имя>.<таблица><расширение>.
+    analytics добавляет таблицы статистики попыток. Возвращает список записанных файлов
+    """
+    file_format = file_format or detect_format(filename)
+    tables = report_tables(data, group_name)
+    if analytics is not None:
+        tables.update((name, frame) for name, frame in analytics.summary_tables(pass_grade).items()
+                      if not frame.empty)
+
+    stem, extension = os.path.splitext(filename)
+    written = []
+    for index, (name, frame) in enumerate(tables.items()):
+        path = filename if index == 0 else f"{stem}.{name}{extension}"
+        # Колонки со смешанными типами приводятся к строкам: Parquet/Arrow требуют один тип
+        if file_format != 'csv':
+            for column in frame.columns[frame.dtypes == object]:
+                if pd.api.types.infer_dtype(frame[column], skipna=True).startswith('mixed'):
+                    frame[column] = frame[column].map(lambda value: None if value is None else str(value))
+        write_table(frame, path, file_format)
+        written.append(path)
+    return written
@@ -0,0 +1,113 @@
+import bisect
+import threading
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from records import Course
+
+COURSE_KEYS = ('id', 'fullname', 'startdate')
+
+# Поля ответа API, которые хранятся в индексе (описание курса и прочее отбрасываются)
+INDEXED_FIELDS = COURSE_KEYS + ('enddate',)
+
+
+def period_timestamps(start_date: str, end_date: str) -> Tuple[int, int]:
+    """
+    Границы периода ГГГГ-ММ-ДД в виде меток времени. ValueError при неверном формате
+    или если начало позже окончания
+    """
+    start_dt = datetime.strptime(start_date, "%Y-%m-%d")
+    end_dt = datetime.strptime(end_date, "%Y-%m-%d")
+    if start_dt > end_dt:
+        raise ValueError("Дата начала периода не может быть позже даты окончания")
+    return int(start_dt.timestamp()), int(end_dt.timestamp())
+
+
+class CourseIndex:
+    """
+    Общий индекс курсов преподавателей: курсы загружаются один раз,
+    после чего выборки по периоду и преподавателю выполняются без запросов к API
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.courses: Dict[int, Dict] = {}
+        self.teachers: Dict[int, Set[int]] = {}
+        self.course_teachers: Dict[int, Set[int]] = {}
+        # Курсы, отсортированные по дате начала: (startdate, порядок добавления, id)
+        self._by_start: List[Tuple[int, int, int]] = []
+
+    def add(self, teacher_id: int, courses: Iterable[Dict]) -> None:
+        """
+        Добавляет курсы преподавателя (ответ core_enrol_get_users_courses)
+        """
+        with self._lock:
+            course_ids = self.teachers.setdefault(teacher_id, set())
+            for course in courses:
+                if not all(key in course for key in COURSE_KEYS):
+                    continue
+                course_id = course['id']
+                if course_id not in self.courses:
+                    self.courses[course_id] = {key: course[key] for key in INDEXED_FIELDS if key in course}
+                    bisect.insort(self._by_start, (course.get('startdate', 0), len(self.courses), course_id))
+                course_ids.add(course_id)
+                self.course_teachers.setdefault(course_id, set()).add(teacher_id)
+
+    def __len__(self) -> int:
+        return len(self.courses)
+
+    def __contains__(self, teacher_id: int) -> bool:
+        return teacher_id in self.teachers
+
+    @staticmethod
+    def course_row(course: Dict) -> Course:
+        """
+        Курс в формате отчета get_teacher_courses
+        """
+        course_start = course.get('startdate', 0)
+        course_end = course.get('enddate', float('inf'))
+        return Course(
+            course['id'],
+            course['fullname'],
+            datetime.fromtimestamp(course_start).strftime('%Y-%m-%d'),
+            datetime.fromtimestamp(course_end).strftime('%Y-%m-%d')
+            if course_end and course_end != float('inf')
+            else 'Не указана'
+        )
+
+    def courses_in_range(self, start_date: str, end_date: str,
+                         teacher_ids: Optional[Iterable[int]] = None) -> List[Course]:
+        """
+        Курсы, начавшиеся не раньше start_date и закончившиеся не позже end_date
+        (или без даты окончания), в порядке добавления в индекс.
+        teacher_ids ограничивает выборку курсами указанных преподавателей
+        """
+        start_timestamp, end_timestamp = period_timestamps(start_date, end_date)
+
+        allowed = None
+        if teacher_ids is not None:
+            allowed = set()
+            for teacher_id in teacher_ids:
+                allowed |= self.teachers.get(teacher_id, set())
+
+        with self._lock:
+            first = bisect.bisect_left(self._by_start, (start_timestamp,))
+            matched = []
+            for _, order, course_id in self._by_start[first:]:
+                if allowed is not None and course_id not in allowed:
+                    continue
+                course_end = self.courses[course_id].get('enddate', float('inf'))
+                if course_end <= end_timestamp or course_end == 0:
+                    matched.append((order, course_id))
+
+        return [self.course_row(self.courses[course_id]) for _, course_id in sorted(matched)]
+
+    def teacher_courses(self, teacher_id: int, start_date: str, end_date: str) -> Tuple[List[Course], int]:
+        """
+        Курсы одного преподавателя за период в формате get_teacher_courses
+        """
+        courses = self.courses_in_range(start_date, end_date, [teacher_id])
+        return courses, len(courses)
+
+    def teachers_of(self, course_id: int) -> List[int]:
+        return sorted(self.course_teachers.get(course_id, ()))
@@ -0,0 +1,396 @@
+import os
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Font, Alignment
+from openpyxl.utils import get_column_letter
+from typing import List, Dict, Tuple, Optional, Union, Iterable, Iterator, Callable, TYPE_CHECKING
+
+from instrumentation import metrics
+from records import failed_quizzes_text
+from report_formats import resolve_format
+
+if TYPE_CHECKING:
+    from attempt_analytics import AttemptAnalytics
+
+# Сколько первых строк листа просматривается в потоковом режиме до записи,
+# чтобы подобрать ширину колонок (в write-only книге ширины задаются до строк)
+STREAM_PREVIEW_ROWS = 1000
+
+
+def _courses_rows(data: Tuple[List[Dict], int]) -> Iterator[List]:
+    courses, count = data
+    yield [
+        "ID курса",
+        "Название курса",
+        "Дата начала",
+        "Дата окончания"
+    ]
+
+    for course in courses:
+        yield [
+            course['id'],
+            course['fullname'],
+            course['startdate'],
+            course['enddate']
+        ]
+
+    yield []
+    yield ["Всего курсов:", count]
+
+
+def _interim_rows(data: Dict) -> Iterator[List]:
+    yield ["Курс ID:", data['course_id']]
+    yield ["Период:",
+           f"{data['period']['start']} - {data['period']['end']}"]
+    yield []
+
+    yield [
+        "ФИО студента",
+        "Элемент оценивания",
+        "Оценка",
+        "Процент",
+        "Макс. оценка",
+        "Дата сдачи"
+    ]
+
+    matrix = data.get('matrix')
+    if matrix is not None:
+        for row, _, user_name, cols in matrix.iter_rows():
+            for col in cols:
+                item = matrix.items[col]
+                yield [
+                    user_name,
+                    item['name'],
+                    matrix.grades[row, col],
+                    matrix.percentages[row, col],
+                    item['max_grade'],
+                    item['date']
+                ]
+    else:
+        # В потоковом режиме items_by_id пополняется по мере чтения студентов
+        items_by_id = data.get('items_by_id')
+        if items_by_id is None:
+            items_by_id = {}
+            for i in data['interim_items']:
+                items_by_id.setdefault(i['id'], i)
+
+        for student in data['students_grades']:
+            for grade in student['grades']:
+                item = items_by_id.get(grade['item_id'])
+
+                yield [
+                    student['userfullname'],
+                    grade['item'],
+                    grade['grade'],
+                    grade['percentage'],
+                    item['max_grade'] if item else '-',
+                    item['date'] if item else '-'
+                ]
+
+
+def _interim_items_rows(data: Dict) -> Iterator[List]:
+    yield [
+        "ID", "Название", "Тип", "Макс. оценка", "Дата"
+    ]
+
+    for item in data['interim_items']:
+        yield [
+            item['id'],
+            item['name'],
+            item['type'],
+            item['max_grade'],
+            item['date']
+        ]
+
+
+def _zachet_rows(data: Iterable[Dict], group_name: str) -> Iterator[List]:
+    yield ["ФИО студента", "Группа", "Оценка", "Не загружены тесты"]
+
+    for result in data:
+        best_grade = result['best_grade']
+        yield [
+            result['user_name'],
+            group_name,
+            # Оценка не загрузилась ни по одному тесту — это не ноль
+            best_grade if best_grade is not None else 'Ошибка загрузки',
+            # Оценка посчитана без этих тестов и может быть занижена
+            failed_quizzes_text(result)
+        ]
+
+
+def _report_sheets(data: Union[Tuple[List[Dict], int], Dict]) -> Optional[List[Tuple[str, Iterator[List]]]]:
+    """
+    Листы отчета в виде пар (название, генератор строк)
+    """
+    if isinstance(data, tuple) and len(data) == 2:
+        return [("Курсы преподавателя", _courses_rows(data))]
+
+    if isinstance(data, dict) and 'students_grades' in data:
+        return [
+            ("Аттестация", _interim_rows(data)),
+            ("Элементы оценивания", _interim_items_rows(data))
+        ]
+
+    return None
+
+
+def write_streaming_workbook(filename: str, sheets: List[Tuple[str, Iterable[List]]],
+                             column_width: Callable[[int], float],
+                             centered_columns: Optional[Dict[str, Tuple[int, ...]]] = None) -> None:
+    """
+    Потоковая запись книги в режиме write-only: строки берутся из генераторов
+    и сразу уходят в файл. Ширина колонок считается по ходу чтения первых
+    STREAM_PREVIEW_ROWS строк каждого листа, без повторного обхода ячеек.
+    Первая строка листа выделяется жирным, centered_columns задает по названию листа
+    колонки, которые центрируются
+    """
+    wb = Workbook(write_only=True)
+    header_font = Font(bold=True)
+    center = Alignment(horizontal='center')
+
+    for title, rows in sheets:
+        ws = wb.create_sheet(title)
+        rows = iter(rows)
+        centered = (centered_columns or {}).get(title, ())
+
+        widths = []
+        preview = []
+        with metrics.phase('export.autosize'):
+            for row in rows:
+                preview.append(row)
+                for i, value in enumerate(row):
+                    length = len(str(value)) if value is not None else 0
+                    if i >= len(widths):
+                        widths.append(length)
+                    elif length > widths[i]:
+                        widths[i] = length
+                if len(preview) >= STREAM_PREVIEW_ROWS:
+                    break
+
+        for i, length in enumerate(widths, start=1):
+            ws.column_dimensions[get_column_letter(i)].width = column_width(length)
+
+        def styled(row_number: int, row: List) -> List:
+            if row_number == 0:
+                cells = []
+                for value in row:
+                    cell = WriteOnlyCell(ws, value=value)
+                    cell.font = header_font
+                    cell.alignment = center
+                    cells.append(cell)
+                return cells
+            if centered and row:
+                row = list(row)
+                for i in centered:
+                    if i < len(row):
+                        cell = WriteOnlyCell(ws, value=row[i])
+                        cell.alignment = center
+                        row[i] = cell
+            return row
+
+        with metrics.phase('export.write_rows'):
+            row_number = 0
+            for row in preview:
+                ws.append(styled(row_number, row))
+                row_number += 1
+            preview.clear()
+            for row in rows:
+                ws.append(styled(row_number, row))
+                row_number += 1
+
+    with metrics.phase('export.save'):
+        wb.save(filename)
+
+
+def _append_sheet(wb: Workbook, title: str, rows: Iterable[List],
+                  column_width: Callable[[int], float]) -> None:
+    """
+    Добавляет в книгу лист с жирным заголовком и подобранной шириной колонок
+    """
+    ws = wb.create_sheet(title)
+    widths = []
+    for row in rows:
+        ws.append(row)
+        for i, value in enumerate(row):
+            length = len(str(value)) if value is not None else 0
+            if i >= len(widths):
+                widths.append(length)
+            elif length > widths[i]:
+                widths[i] = length
+
+    for cell in ws[1]:
+        cell.font = Font(bold=True)
+        cell.alignment = Alignment(horizontal='center')
+    for i, length in enumerate(widths, start=1):
+        ws.column_dimensions[get_column_letter(i)].width = column_width(length)
+
+
+def export_to_excel(data: Union[Tuple[List[Dict], int], Dict], filename: str,
+                    streaming: bool = False,
+                    analytics: Optional['AttemptAnalytics'] = None,
+                    pass_grade: Optional[float] = None) -> None:
+    """
+    Универсальная функция для экспорта данных из:
+    - get_teacher_courses()
+    - track_interim_assessment()
+    streaming=True пишет книгу потоково (write-only) для очень больших отчетов.
+    analytics добавляет листы со статистикой попыток
+    """
+    if not data:
+        print("Нет данных для экспорта")
+        return
+
+    try:
+        sheets = _report_sheets(data)
+        if sheets is None:
+            print("Неподдерживаемый формат данных")
+            return
+        if analytics is not None:
+            sheets.extend(analytics.summary_sheets(pass_grade))
+
+        if streaming:
+            write_streaming_workbook(filename, sheets, lambda length: (length + 2) * 1.2)
+            print(f"Файл {filename} успешно сохранен")
+            return
+
+        with metrics.phase('export.write_rows'):
+            wb = Workbook()
+            for index, (title, rows) in enumerate(sheets):
+                ws = wb.active if index == 0 else wb.create_sheet(title)
+                ws.title = title
+                for row in rows:
+                    ws.append(row)
+
+        with metrics.phase('export.autosize'):
+            for sheet in wb:
+                for row in sheet.iter_rows(max_row=1):
+                    for cell in row:
+                        cell.font = Font(bold=True)
+                        cell.alignment = Alignment(horizontal='center')
+
+                for column in sheet.columns:
+                    max_length = 0
+                    column_cells = [cell for cell in column]
+                    for cell in column_cells:
+                        try:
+                            if len(str(cell.value)) > max_length:
+                                max_length = len(str(cell.value))
+                        except:
+                            pass
+                    adjusted_width = (max_length + 2) * 1.2
+                    sheet.column_dimensions[column_cells[0].column_letter].width = adjusted_width
+
+        with metrics.phase('export.save'):
+            wb.save(filename)
+        print(f"Файл {filename} успешно сохранен")
+
+    except Exception as e:
+        print(f"Ошибка при экспорте в Excel: {e}")
+
+
+def zachet_export_to_excel(data: List[Dict], filename: str, group_name: str,
+                           streaming: bool = False,
+                           analytics: Optional['AttemptAnalytics'] = None,
+                           pass_grade: Optional[float] = None) -> None:
+    """
+    Экспорт результатов в Excel (только ФИО, группа и оценка)
+    Улучшенная версия с:
+    - Проверкой данных
+    - Очисткой имен
+    - Форматированием оценок
+    streaming=True пишет книгу потоково (write-only), data может быть генератором.
+    analytics добавляет листы со статистикой попыток (pass_grade — порог сдачи)
+    """
+    if not data:
+        print("Нет данных для экспорта")
+        return
+
+    try:
+        summary_sheets = analytics.summary_sheets(pass_grade) if analytics is not None else []
+
+        if streaming:
+            write_streaming_workbook(
+                filename,
+                [("Результаты зачета", _zachet_rows(data, group_name))] + summary_sheets,
+                lambda length: length + 2,
+                centered_columns={"Результаты зачета": (2,)}
+            )
+            print(f"Файл сохранен: {filename}")
+            return
+
+        with metrics.phase('export.write_rows'):
+            wb = Workbook()
+            ws = wb.active
+            ws.title = "Результаты зачета"
+
+            # Заголовки и данные
+            for row in _zachet_rows(data, group_name):
+                ws.append(row)
+
+        # Форматирование
+        with metrics.phase('export.autosize'):
+            # 1. Жирные заголовки
+            for cell in ws[1]:
+                cell.font = Font(bold=True)
+                cell.alignment = Alignment(horizontal='center')
+
+            # 2. Автоподбор ширины колонок
+            for col in ws.columns:
+                max_len = max(
+                    (len(str(cell.value)) for cell in col),
+                    default=0
+                )
+                ws.column_dimensions[col[0].column_letter].width = max_len + 2
+
+            # 3. Центрирование оценок
+            for row in ws.iter_rows(min_row=2, max_col=3, max_row=len(data)+1):
+                row[2].alignment = Alignment(horizontal='center')  # Колонка с оценками
+
+            # 4. Листы статистики
+            for title, rows in summary_sheets:
+                _append_sheet(wb, title, rows, lambda length: length + 2)
+
+        with metrics.phase('export.save'):
+            wb.save(filename)
+        print(f"Файл сохранен: {filename}")
+
+    except Exception as e:
+        print(f"Ошибка экспорта: {str(e)}")
+        raise
+
+
+def export_report(data: Union[Tuple[List[Dict], int], Dict, List[Dict]], filename: str,
+                  file_format: Optional[str] = None, group_name: Optional[str] = None,
+                  streaming: bool = False,
+                  analytics: Optional['AttemptAnalytics'] = None,
+                  pass_grade: Optional[float] = None) -> List[str]:
+    """
+    Единая точка экспорта отчетов. Формат (xlsx, csv, parquet, arrow) берется
+    из file_format или из расширения файла. Колоночные форматы пишутся напрямую
+    из DataFrame, без ячеек openpyxl. Возвращает список записанных файлов
+    """
+    file_format = resolve_format(filename, file_format)
+
+    if file_format == 'xlsx':
+        if isinstance(data, (tuple, dict)):
+            export_to_excel(data, filename, streaming=streaming, analytics=analytics, pass_grade=pass_grade)
+        else:
+            zachet_export_to_excel(data, filename, group_name, streaming=streaming,
+                                   analytics=analytics, pass_grade=pass_grade)
+        return [filename] if os.path.exists(filename) else []
+
+    if not data:
+        print("Нет данных для экспорта")
+        return []
+
+    # pandas нужен только колоночным форматам
+    from columnar_export import export_columnar
+
+    try:
+        with metrics.phase('export.columnar'):
+            written = export_columnar(data, filename, file_format, group_name, analytics, pass_grade)
+        print(f"Файлы сохранены: {', '.join(written)}")
+        return written
+    except Exception as e:
+        print(f"Ошибка экспорта: {e}")
+        return []
@@ -0,0 +1,106 @@
+import numpy as np
+from typing import List, Dict, Optional, Tuple, Iterator
+
+
+class GradeMatrix:
+    """
+    Компактная матрица оценок студенты × элементы оценивания.
+    Строки и столбцы адресуются через словари id -> индекс, поэтому
+    поиск оценки студента по элементу выполняется за O(1)
+    """
+
+    def __init__(self, user_ids: List[int], user_names: List[str], items: List[Dict],
+                 grades: np.ndarray, percentages: np.ndarray, raw: np.ndarray,
+                 present: np.ndarray):
+        self.user_ids = user_ids
+        self.user_names = user_names
+        self.items = items
+        self.grades = grades
+        self.percentages = percentages
+        self.raw = raw
+        self.present = present
+        self.user_index = {user_id: i for i, user_id in enumerate(user_ids)}
+        self.item_index = {item['id']: j for j, item in enumerate(items)}
+
+    @classmethod
+    def from_usergrades(cls, usergrades: List[Dict]) -> 'GradeMatrix':
+        """
+        Строит матрицу за один проход по usergrades из gradereport_user_get_grade_items.
+        Для каждого элемента сохраняется его первое вхождение (как и раньше в отчете)
+        """
+        user_ids, user_names = [], []
+        items, item_index = [], {}
+        cells = []
+
+        for student in usergrades:
+            try:
+                user_id, user_name = student['userid'], student['userfullname']
+            except KeyError as e:
+                print(f"Ошибка обработки студента {student.get('userid')}: {e}")
+                continue
+            row = len(user_ids)
+            user_ids.append(user_id)
+            user_names.append(user_name)
+
+            for item in student.get('gradeitems', []):
+                item_id = item['id']
+                col = item_index.get(item_id)
+                if col is None:
+                    col = item_index[item_id] = len(items)
+                    items.append(item)
+                cells.append((row, col,
+                              item.get('gradeformatted', '-'),
+                              item.get('percentageformatted', '-'),
+                              item.get('graderaw')))
+
+        shape = (len(user_ids), len(items))
+        grades = np.full(shape, '-', dtype=object)
+        percentages = np.full(shape, '-', dtype=object)
+        raw = np.full(shape, np.nan, dtype=np.float64)
+        present = np.zeros(shape, dtype=bool)
+
+        for row, col, grade, percentage, raw_grade in cells:
+            grades[row, col] = grade
+            percentages[row, col] = percentage
+            if raw_grade is not None:
+                raw[row, col] = float(raw_grade)
+            present[row, col] = True
+
+        return cls(user_ids, user_names, items, grades, percentages, raw, present)
+
+    @property
+    def shape(self) -> Tuple[int, int]:
+        return self.present.shape
+
+    def select_items(self, item_ids: List[int], items: Optional[List[Dict]] = None) -> 'GradeMatrix':
+        """
+        Возвращает матрицу только с указанными элементами (в заданном порядке).
+        items позволяет заменить исходные словари элементов, например, описаниями для отчета
+        """
+        cols = [self.item_index[item_id] for item_id in item_ids]
+        return GradeMatrix(
+            self.user_ids,
+            self.user_names,
+            items if items is not None else [self.items[col] for col in cols],
+            self.grades[:, cols],
+            self.percentages[:, cols],
+            self.raw[:, cols],
+            self.present[:, cols]
+        )
+
+    def cell(self, user_id: int, item_id: int) -> Optional[Tuple[str, str]]:
+        """
+        Оценка и процент студента по элементу или None, если оценки нет
+        """
+        row = self.user_index.get(user_id)
+        col = self.item_index.get(item_id)
+        if row is None or col is None or not self.present[row, col]:
+            return None
+        return self.grades[row, col], self.percentages[row, col]
+
+    def iter_rows(self) -> Iterator[Tuple[int, int, str, List[int]]]:
+        """
+        Перебирает строки: (индекс строки, id студента, ФИО, индексы столбцов с оценками)
+        """
+        for row, user_id in enumerate(self.user_ids):
+            yield row, user_id, self.user_names[row], np.flatnonzero(self.present[row]).tolist()
@@ -0,0 +1,202 @@
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional, Iterator
+
+# Верхние границы корзин гистограммы задержек, в секундах
+LATENCY_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, float('inf'))
+
+BeforeHook = Callable[[str, Dict], None]
+AfterHook = Callable[[Dict], None]
+
+
+class FunctionStats:
+    """
+    Счетчики одной функции API
+    """
+
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.cache_hits = 0
+        self.coalesced = 0
+        self.bytes = 0
+        self.total_time = 0.0
+        self.decode_time = 0.0
+        self.histogram = [0] * len(LATENCY_BUCKETS)
+
+    def as_dict(self) -> Dict:
+        return {
+            'calls': self.calls,
+            'errors': self.errors,
+            'cache_hits': self.cache_hits,
+            'coalesced': self.coalesced,
+            'bytes': self.bytes,
+            'total_time': self.total_time,
+            'decode_time': self.decode_time,
+            'histogram': dict(zip(LATENCY_BUCKETS, self.histogram)),
+        }
+
+
+class Instrumentation:
+    """
+    Метрики вызовов API по wsfunction, хуки до/после вызова и замеры фаз отчета
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.functions: Dict[str, FunctionStats] = {}
+        self.phases: Dict[str, Dict[str, float]] = {}
+        self.before_hooks: List[BeforeHook] = []
+        self.after_hooks: List[AfterHook] = []
+
+    def add_hooks(self, before: Optional[BeforeHook] = None, after: Optional[AfterHook] = None) -> None:
+        """
+        before(function, params) вызывается перед запросом,
+        after(event) — после, event содержит function, elapsed, bytes, decode_time, error
+        """
+        if before:
+            self.before_hooks.append(before)
+        if after:
+            self.after_hooks.append(after)
+
+    def remove_hooks(self, before: Optional[BeforeHook] = None, after: Optional[AfterHook] = None) -> None:
+        if before in self.before_hooks:
+            self.before_hooks.remove(before)
+        if after in self.after_hooks:
+            self.after_hooks.remove(after)
+
+    def _stats(self, function: str) -> FunctionStats:
+        stats = self.functions.get(function)
+        if stats is None:
+            stats = self.functions[function] = FunctionStats()
+        return stats
+
+    def call_started(self, function: str, params: Dict) -> None:
+        for hook in self.before_hooks:
+            try:
+                hook(function, params)
+            except Exception as e:
+                print(f"Ошибка в хуке до вызова {function}: {e}")
+
+    def call_finished(self, function: str, elapsed: float, nbytes: int = 0,
+                      decode_time: float = 0.0, error: Optional[str] = None) -> None:
+        with self._lock:
+            stats = self._stats(function)
+            stats.calls += 1
+            stats.bytes += nbytes
+            stats.total_time += elapsed
+            stats.decode_time += decode_time
+            stats.histogram[bisect.bisect_left(LATENCY_BUCKETS, elapsed)] += 1
+            if error:
+                stats.errors += 1
+
+        event = {
+            'function': function,
+            'elapsed': elapsed,
+            'bytes': nbytes,
+            'decode_time': decode_time,
+            'error': error,
+        }
+        for hook in self.after_hooks:
+            try:
+                hook(event)
+            except Exception as e:
+                print(f"Ошибка в хуке после вызова {function}: {e}")
+
+    def cache_hit(self, function: str) -> None:
+        with self._lock:
+            self._stats(function).cache_hits += 1
+
+    def call_coalesced(self, function: str) -> None:
+        """
+        Вызов получил ответ одновременного запроса с теми же параметрами
+        """
+        with self._lock:
+            self._stats(function).coalesced += 1
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        """
+        Замеряет длительность фазы отчета (суммируется при повторных входах)
+        """
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - started
+            with self._lock:
+                phase = self.phases.setdefault(name, {'calls': 0, 'total_time': 0.0})
+                phase['calls'] += 1
+                phase['total_time'] += elapsed
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            return {
+                'functions': {name: stats.as_dict() for name, stats in self.functions.items()},
+                'phases': {name: dict(phase) for name, phase in self.phases.items()},
+            }
+
+    def reset(self) -> None:
+        with self._lock:
+            self.functions.clear()
+            self.phases.clear()
+
+    @contextmanager
+    def run(self, title: str = 'Отчет', verbose: bool = True) -> Iterator[Dict]:
+        """
+        Сводка по запуску отчета: разница счетчиков между входом и выходом.
+        Возвращаемый словарь заполняется при выходе из блока
+        """
+        before = self.snapshot()
+        started = time.perf_counter()
+        summary: Dict = {'title': title}
+        try:
+            yield summary
+        finally:
+            summary['wall_time'] = time.perf_counter() - started
+            summary.update(_diff(before, self.snapshot()))
+            if verbose:
+                print(format_summary(summary))
+
+
+def _diff(before: Dict, after: Dict) -> Dict:
+    functions = {}
+    for name, stats in after['functions'].items():
+        old = before['functions'].get(name)
+        if old is None:
+            functions[name] = stats
+            continue
+        delta = {key: stats[key] - old[key] for key in stats if key != 'histogram'}
+        delta['histogram'] = {bucket: count - old['histogram'][bucket]
+                              for bucket, count in stats['histogram'].items()}
+        if delta['calls'] or delta['cache_hits'] or delta['coalesced']:
+            functions[name] = delta
+
+    phases = {}
+    for name, phase in after['phases'].items():
+        old = before['phases'].get(name, {'calls': 0, 'total_time': 0.0})
+        if phase['calls'] != old['calls']:
+            phases[name] = {key: phase[key] - old[key] for key in phase}
+
+    return {'functions': functions, 'phases': phases}
+
+
+def format_summary(summary: Dict) -> str:
+    lines = [f"\n{summary.get('title', 'Отчет')}: {summary.get('wall_time', 0):.3f} с"]
+    if summary.get('functions'):
+        lines.append(f"{'Функция API':<40} {'Вызовов':>8} {'Ошибок':>7} {'Кэш':>6} {'Слито':>6} "
+                     f"{'КБ':>10} {'Время, с':>9} {'JSON, с':>8}")
+        for name, stats in sorted(summary['functions'].items(), key=lambda x: -x[1]['total_time']):
+            lines.append(f"{name:<40} {stats['calls']:>8} {stats['errors']:>7} {stats['cache_hits']:>6} "
+                         f"{stats['coalesced']:>6} {stats['bytes'] / 1024:>10.1f} {stats['total_time']:>9.3f} {stats['decode_time']:>8.3f}")
+    if summary.get('phases'):
+        lines.append(f"{'Фаза':<40} {'Раз':>8} {'Время, с':>9}")
+        for name, phase in summary['phases'].items():
+            lines.append(f"{name:<40} {phase['calls']:>8} {phase['total_time']:>9.3f}")
+    return '\n'.join(lines)
+
+
+# Общий экземпляр для клиентов и экспорта, если не передан свой
+metrics = Instrumentation()
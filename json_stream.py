@@ -0,0 +1,124 @@
+import codecs
+import json
+from typing import Any, Iterable, Iterator
+
+_decoder = json.JSONDecoder()
+_WHITESPACE = ' \t\n\r'
+_DELIMITERS = _WHITESPACE + ',:]}'
+
+
+class _Buffer:
+    """
+    Текстовый буфер над потоком байтов с инкрементальным декодированием UTF-8
+    """
+
+    def __init__(self, chunks: Iterable[bytes]):
+        self._chunks = iter(chunks)
+        self._utf8 = codecs.getincrementaldecoder('utf-8')()
+        self.text = ''
+        self.pos = 0
+        self.exhausted = False
+
+    def fill(self) -> bool:
+        """
+        Дочитывает следующий фрагмент, отбрасывая уже разобранную часть буфера
+        """
+        if self.exhausted:
+            return False
+        for chunk in self._chunks:
+            if not chunk:
+                continue
+            self.text = self.text[self.pos:] + self._utf8.decode(chunk)
+            self.pos = 0
+            return True
+        self.text = self.text[self.pos:] + self._utf8.decode(b'', final=True)
+        self.pos = 0
+        self.exhausted = True
+        return False
+
+    def skip(self, chars: str) -> None:
+        while True:
+            while self.pos < len(self.text) and self.text[self.pos] in chars:
+                self.pos += 1
+            if self.pos < len(self.text) or not self.fill():
+                return
+
+    def peek(self) -> str:
+        self.skip('')
+        return self.text[self.pos] if self.pos < len(self.text) else ''
+
+
+def _read_value(buffer: _Buffer, key: str) -> Any:
+    """
+    Разбирает очередное JSON-значение с текущей позиции, дочитывая поток по мере надобности
+    """
+    while True:
+        try:
+            value, end = _decoder.raw_decode(buffer.text, buffer.pos)
+            # Значение, за которым в буфере нет разделителя (например, число «1» из «1.5»),
+            # может продолжаться в следующем фрагменте
+            if buffer.exhausted or (end < len(buffer.text) and buffer.text[end] in _DELIMITERS):
+                buffer.pos = end
+                return value
+        except json.JSONDecodeError:
+            if buffer.exhausted:
+                raise ValueError(f"Ответ оборвался или некорректен при поиске {key}")
+        buffer.fill()
+
+
+def iter_json_array(chunks: Iterable[bytes], key: str) -> Iterator[Any]:
+    """
+    Потоково разбирает JSON-объект и по одному выдает элементы массива по ключу key
+    верхнего уровня, не загружая ответ целиком. Ключи вложенных объектов и строковые
+    значения не учитываются. Если ключ не найден, поднимается ValueError с содержимым ответа
+    """
+    buffer = _Buffer(chunks)
+
+    buffer.skip(_WHITESPACE)
+    if buffer.peek() != '{':
+        # Не объект (например, список или текст ошибки) — разбирается целиком для сообщения
+        while buffer.fill():
+            pass
+        try:
+            payload = json.loads(buffer.text)
+        except ValueError:
+            payload = buffer.text[:200]
+        raise ValueError(f"В ответе нет ключа {key}: {payload}")
+    buffer.pos += 1
+
+    # Ключи верхнего уровня перед key пропускаются, их значения разбираются целиком
+    # (обычно это небольшие поля вроде warnings) и сохраняются для сообщения об ошибке
+    skipped = {}
+    while True:
+        buffer.skip(_WHITESPACE + ',')
+        char = buffer.peek()
+        if char == '}' or not char:
+            raise ValueError(f"В ответе нет ключа {key}: {skipped}")
+        if char != '"':
+            raise ValueError(f"Некорректный JSON: ожидался ключ объекта перед {key}")
+        name = _read_value(buffer, key)
+        buffer.skip(_WHITESPACE)
+        if buffer.peek() != ':':
+            raise ValueError(f"Некорректный JSON после ключа {name}")
+        buffer.pos += 1
+        buffer.skip(_WHITESPACE)
+        if name == key:
+            break
+        skipped[name] = _read_value(buffer, key)
+
+    if buffer.peek() != '[':
+        raise ValueError(f"Значение {key} не является массивом")
+    buffer.pos += 1
+
+    while True:
+        buffer.skip(_WHITESPACE + ',')
+        char = buffer.peek()
+        if char == ']':
+            return
+        if not char:
+            raise ValueError(f"Ответ оборвался внутри массива {key}")
+        try:
+            value = _read_value(buffer, key)
+        except ValueError:
+            raise ValueError(f"Ответ оборвался внутри массива {key}")
+        yield value
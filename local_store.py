@@ -0,0 +1,108 @@
+import json
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Optional, Tuple, Any
+
+# Состояния попыток, которые еще могут измениться
+OPEN_ATTEMPT_STATES = ('inprogress', 'overdue')
+
+
+class LocalStore:
+    """
+    Локальное хранилище данных Moodle на SQLite для инкрементальной синхронизации.
+    Хранит попытки по парам (студент, тест) и снимки журнала оценок курса
+    вместе со временем их загрузки
+    """
+
+    def __init__(self, path: str = 'moodle_store.sqlite3'):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS attempts (
+                userid INTEGER NOT NULL,
+                quizid INTEGER NOT NULL,
+                payload TEXT NOT NULL,
+                has_open INTEGER NOT NULL,
+                synced_at REAL NOT NULL,
+                PRIMARY KEY (userid, quizid)
+            );
+            CREATE TABLE IF NOT EXISTS grade_reports (
+                courseid INTEGER NOT NULL,
+                groupid INTEGER NOT NULL,
+                payload TEXT NOT NULL,
+                synced_at REAL NOT NULL,
+                PRIMARY KEY (courseid, groupid)
+            );
+        """)
+        self._conn.commit()
+
+    def save_attempts(self, user_id: int, quiz_id: int, attempts: List[Dict],
+                      synced_at: Optional[float] = None) -> None:
+        """
+        Сохраняет все попытки студента по тесту, полученные из mod_quiz_get_user_attempts
+        """
+        has_open = any(attempt.get('state') in OPEN_ATTEMPT_STATES for attempt in attempts)
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO attempts (userid, quizid, payload, has_open, synced_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (user_id, quiz_id, json.dumps(attempts, ensure_ascii=False), int(has_open),
+                 time.time() if synced_at is None else synced_at)
+            )
+            self._conn.commit()
+
+    def get_attempts(self, user_id: int, quiz_id: int) -> Optional[List[Dict]]:
+        """
+        Попытки из хранилища или None, если пара еще не синхронизировалась
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT payload FROM attempts WHERE userid = ? AND quizid = ?", (user_id, quiz_id)
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def get_attempts_state(self, pairs: List[Tuple[int, int]]) -> Dict[Tuple[int, int], Tuple[float, bool]]:
+        """
+        Время последней синхронизации и наличие незавершенных попыток для пар (студент, тест)
+        """
+        state = {}
+        with self._lock:
+            for user_id, quiz_id in pairs:
+                row = self._conn.execute(
+                    "SELECT synced_at, has_open FROM attempts WHERE userid = ? AND quizid = ?",
+                    (user_id, quiz_id)
+                ).fetchone()
+                if row:
+                    state[(user_id, quiz_id)] = (row[0], bool(row[1]))
+        return state
+
+    def save_grade_report(self, course_id: int, payload: Any, group_id: int = 0,
+                          synced_at: Optional[float] = None) -> None:
+        """
+        Сохраняет ответ gradereport_user_get_grade_items для курса (и группы)
+        """
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO grade_reports (courseid, groupid, payload, synced_at) "
+                "VALUES (?, ?, ?, ?)",
+                (course_id, group_id, json.dumps(payload, ensure_ascii=False),
+                 time.time() if synced_at is None else synced_at)
+            )
+            self._conn.commit()
+
+    def get_grade_report(self, course_id: int, group_id: int = 0) -> Optional[Tuple[Any, float]]:
+        """
+        Сохраненный журнал оценок и время его загрузки
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT payload, synced_at FROM grade_reports WHERE courseid = ? AND groupid = ?",
+                (course_id, group_id)
+            ).fetchone()
+        return (json.loads(row[0]), row[1]) if row else None
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
@@ -1,179 +1,232 @@
-from moodle_client import *
-from openpyxl import Workbook
-from openpyxl.styles import Font, Alignment
-
-
-def export_to_excel(data: Union[Tuple[List[Dict], int], Dict], filename: str) -> None:
+"""
+Командная строка отчетов Moodle.
+
+Тяжелые модули (requests, openpyxl, pandas) импортируются только внутри команд,
+поэтому --help и быстрые команды запускаются без лишних затрат.
+
+Примеры:
+    python main.py zachet --course 5 --group 1 --quiz 3 -o f.xlsx
+    python main.py zachet --course 5 --group 1 --quiz 3 --quiz 4 --stats --pass-grade 6 -o f.xlsx
+    python main.py interim --course 5 --start 2024-09-01 --end 2024-12-31 -o interim.parquet
+    python main.py courses --teacher-email teacher@example.com --start 2024-09-01 --end 2024-12-31 -o courses.xlsx
+    python main.py courses --teacher-email a@example.com --teacher-email b@example.com ... -o department.xlsx
+    python main.py --store store.sqlite3 zachet --course 5 --group 1 --quiz 3 --incremental -o f.xlsx
+    python main.py serve --port 8765 --store store.sqlite3 --prewarm prewarm.json
+    python main.py --cache cache.sqlite3 --store store.sqlite3 prewarm prewarm.json
+"""
+import argparse
+import sys
+
+
+def add_client_options(parser: argparse.ArgumentParser) -> None:
     """
-    Универсальная функция для экспорта данных из:
-    - get_teacher_courses()
-    - track_interim_assessment()
+    Параметры клиента Moodle, общие для main.py и report_jobs.py (см. make_client)
     """
-    if not data:
-        print("Нет данных для экспорта")
-        return
+    parser.add_argument('--cache', metavar='PATH', help="Дисковый кэш ответов API (SQLite)")
+    parser.add_argument('--workers', type=int, default=8, help="Максимум параллельных запросов")
+    parser.add_argument('--rate', type=float, metavar='RPS', help="Не более RPS запросов к Moodle в секунду")
+    parser.add_argument('--store', metavar='PATH',
+                        help="Локальное хранилище попыток и журналов (SQLite) для prewarm и incremental")
 
-    try:
-        wb = Workbook()
-
-        if isinstance(data, tuple) and len(data) == 2:
-            courses, count = data
-            ws = wb.active
-            ws.title = "Курсы преподавателя"
-
-            headers = [
-                "ID курса",
-                "Название курса",
-                "Дата начала",
-                "Дата окончания"
-            ]
-            ws.append(headers)
-
-            for course in courses:
-                ws.append([
-                    course['id'],
-                    course['fullname'],
-                    course['startdate'],
-                    course['enddate']
-                ])
-
-            ws.append([])
-            ws.append(["Всего курсов:", count])
-
-        elif isinstance(data, dict) and 'students_grades' in data:
-            ws = wb.active
-            ws.title = "Аттестация"
-
-            ws.append(["Курс ID:", data['course_id']])
-            ws.append(["Период:",
-                       f"{data['period']['start']} - {data['period']['end']}"])
-            ws.append([])
-
-            headers = [
-                "ФИО студента",
-                "Элемент оценивания",
-                "Оценка",
-                "Процент",
-                "Макс. оценка",
-                "Дата сдачи"
-            ]
-            ws.append(headers)
-
-            for student in data['students_grades']:
-                for grade in student['grades']:
-                    item = next(
-                        (i for i in data['interim_items']
-                         if i['name'] == grade['item']),
-                        None
-                    )
-
-                    ws.append([
-                        student['userfullname'],
-                        grade['item'],
-                        grade['grade'],
-                        grade['percentage'],
-                        item['max_grade'] if item else '-',
-                        item['date'] if item else '-'
-                    ])
-
-            ws_items = wb.create_sheet("Элементы оценивания")
-            ws_items.append([
-                "ID", "Название", "Тип", "Макс. оценка", "Дата"
-            ])
-
-            for item in data['interim_items']:
-                ws_items.append([
-                    item['id'],
-                    item['name'],
-                    item['type'],
-                    item['max_grade'],
-                    item['date']
-                ])
-
-        else:
-            print("Неподдерживаемый формат данных")
-            return
-
-        for sheet in wb:
-            for row in sheet.iter_rows(max_row=1):
-                for cell in row:
-                    cell.font = Font(bold=True)
-                    cell.alignment = Alignment(horizontal='center')
-
-            for column in sheet.columns:
-                max_length = 0
-                column_cells = [cell for cell in column]
-                for cell in column_cells:
-                    try:
-                        if len(str(cell.value)) > max_length:
-                            max_length = len(str(cell.value))
-                    except:
-                        pass
-                adjusted_width = (max_length + 2) * 1.2
-                sheet.column_dimensions[column_cells[0].column_letter].width = adjusted_width
-
-        wb.save(filename)
-        print(f"Файл {filename} успешно сохранен")
-
-    except Exception as e:
-        print(f"Ошибка при экспорте в Excel: {e}")
-
-
-def zachet_export_to_excel(data: List[Dict], filename: str, group_name: str) -> None:
+
+def make_client(args: argparse.Namespace, in_memory_cache: bool = False):
+    from moodle_client import MoodleClient
+    from moodle_cache import ResponseCache, MemoryResponseCache
+    from local_store import LocalStore
+
+    if args.cache:
+        cache = ResponseCache(args.cache)
+    elif in_memory_cache:
+        cache = MemoryResponseCache()
+    else:
+        cache = None
+    store = LocalStore(args.store) if args.store else None
+    return MoodleClient(max_workers=args.workers, cache=cache, store=store, rate_limit=args.rate)
+
+
+def check_output(args: argparse.Namespace) -> bool:
     """
-    Экспорт результатов в Excel (только ФИО, группа и оценка)
-    Улучшенная версия с:
-    - Проверкой данных
-    - Очисткой имен
-    - Форматированием оценок
+    Проверяет формат файла отчета до загрузки данных
     """
-    if not data:
-        print("Нет данных для экспорта")
-        return
+    from report_formats import resolve_format
 
     try:
-        wb = Workbook()
-        ws = wb.active
-        ws.title = "Результаты зачета"
-
-        # Заголовки с форматированием
-        headers = ["ФИО студента", "Группа", "Оценка"]
-        ws.append(headers)
-
-        # Заполняем данные
-        for result in data:
-            ws.append([
-                result['user_name'],
-                group_name,
-                result['best_grade']
-            ])
-
-        # Форматирование
-        # 1. Жирные заголовки
-        for cell in ws[1]:
-            cell.font = Font(bold=True)
-            cell.alignment = Alignment(horizontal='center')
-
-        # 2. Автоподбор ширины колонок
-        for col in ws.columns:
-            max_len = max(
-                (len(str(cell.value)) for cell in col),
-                default=0
-            )
-            ws.column_dimensions[col[0].column_letter].width = max_len + 2
-
-        # 3. Центрирование оценок
-        for row in ws.iter_rows(min_row=2, max_col=3, max_row=len(data)+1):
-            row[2].alignment = Alignment(horizontal='center')  # Колонка с оценками
-
-        wb.save(filename)
-        print(f"Файл сохранен: {filename}")
-
-    except Exception as e:
-        print(f"Ошибка экспорта: {str(e)}")
-        raise
-
-client = MoodleClient()
-atempts = client.analyze_attempts_results([3], 1, 5)
-#groups = client.get_course_groups(5)
-zachet_export_to_excel(atempts, 'f.xlsx', client.get_group_name(1))
+        resolve_format(args.output, args.format)
+    except ValueError as e:
+        print(e)
+        return False
+    return True
+
+
+def run_report(args: argparse.Namespace, job: dict) -> int:
+    from exporters import export_report
+    from instrumentation import metrics
+    from report_jobs import fetch_job
+    from request_scheduler import format_scheduler
+
+    client = make_client(args)
+    with metrics.run(f"Отчет {job['type']}", verbose=args.metrics):
+        data, options = fetch_job(client, job)
+        export_report(data, args.output, args.format, streaming=args.streaming, **options)
+    if args.metrics:
+        print(format_scheduler(client.scheduler.snapshot()))
+    return 0 if data else 1
+
+
+def check_incremental(args: argparse.Namespace) -> bool:
+    if args.incremental and not args.store:
+        print("Для --incremental нужен --store")
+        return False
+    if args.incremental and getattr(args, 'checkpoint', None):
+        print("--incremental и --checkpoint не используются вместе")
+        return False
+    return True
+
+
+def cmd_zachet(args: argparse.Namespace) -> int:
+    if not check_output(args) or not check_incremental(args):
+        return 2
+    return run_report(args, {
+        'type': 'zachet',
+        'course_id': args.course,
+        'group_id': args.group,
+        'quiz_ids': args.quiz,
+        'mode': args.mode,
+        'strategy': args.strategy,
+        'checkpoint': args.checkpoint,
+        'incremental': args.incremental,
+        'stats': args.stats or args.pass_grade is not None,
+        'pass_grade': args.pass_grade,
+    })
+
+
+def cmd_interim(args: argparse.Namespace) -> int:
+    if not check_output(args) or not check_incremental(args):
+        return 2
+    return run_report(args, {
+        'type': 'interim',
+        'course_id': args.course,
+        'start': args.start,
+        'end': args.end,
+        'incremental': args.incremental,
+    })
+
+
+def cmd_courses(args: argparse.Namespace) -> int:
+    if not args.teacher_id and not args.teacher_email:
+        print("Укажите --teacher-id или --teacher-email")
+        return 2
+    if not check_output(args):
+        return 2
+    return run_report(args, {
+        'type': 'courses',
+        'teacher_ids': args.teacher_id,
+        'teacher_emails': args.teacher_email,
+        'start': args.start,
+        'end': args.end,
+    })
+
+
+def cmd_serve(args: argparse.Namespace) -> int:
+    from report_service import serve
+
+    client = make_client(args, in_memory_cache=True)
+    prewarm = None
+    if args.prewarm:
+        from prewarm import PrewarmScheduler, load_prewarm_manifest
+        prewarm = PrewarmScheduler(client, load_prewarm_manifest(args.prewarm)).start()
+    try:
+        serve(client, args.host, args.port)
+    finally:
+        if prewarm is not None:
+            prewarm.stop()
+    return 0
+
+
+def cmd_prewarm(args: argparse.Namespace) -> int:
+    from prewarm import PrewarmScheduler, load_prewarm_manifest
+
+    if not args.cache or not args.store:
+        print("Для прогрева нужны --cache и --store: отчеты других процессов читают данные из них")
+        return 2
+    scheduler = PrewarmScheduler(make_client(args), load_prewarm_manifest(args.manifest), args.poll)
+    if args.once:
+        scheduler.run_pending()
+        return 0
+    try:
+        scheduler.run_forever()
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+def build_parser() -> argparse.ArgumentParser:
+    from report_formats import REPORT_FORMATS
+
+    parser = argparse.ArgumentParser(description="Отчеты по данным Moodle")
+    add_client_options(parser)
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    def add_output(sub: argparse.ArgumentParser) -> None:
+        sub.add_argument('-o', '--output', required=True, help="Файл отчета (.xlsx, .csv, .parquet, .arrow)")
+        sub.add_argument('--format', choices=REPORT_FORMATS,
+                         help="Формат (по умолчанию — по расширению файла)")
+        sub.add_argument('--streaming', action='store_true', help="Потоковая запись xlsx")
+        sub.add_argument('--metrics', action='store_true', help="Вывести сводку вызовов API и фаз")
+
+    zachet = subparsers.add_parser('zachet', help="Лучшие оценки группы по тестам")
+    zachet.add_argument('--course', type=int, required=True)
+    zachet.add_argument('--group', type=int, required=True)
+    zachet.add_argument('--quiz', type=int, action='append', required=True, help="ID теста (можно несколько)")
+    zachet.add_argument('--mode', choices=['sequential', 'threads'], default='sequential')
+    zachet.add_argument('--strategy', choices=['attempts', 'bulk'], default='attempts')
+    zachet.add_argument('--checkpoint', metavar='PATH',
+                        help="Файл контрольных точек: прерванный запуск с теми же параметрами продолжается")
+    zachet.add_argument('--stats', action='store_true',
+                        help="Добавить статистику попыток (по тестам, группе, распределение оценок)")
+    zachet.add_argument('--pass-grade', type=float, metavar='GRADE',
+                        help="Порог сдачи для доли сдавших (включает --stats)")
+    zachet.add_argument('--incremental', action='store_true',
+                        help="Брать попытки из --store, догружая только изменившиеся")
+    add_output(zachet)
+    zachet.set_defaults(func=cmd_zachet)
+
+    interim = subparsers.add_parser('interim', help="Промежуточная аттестация по курсу")
+    interim.add_argument('--course', type=int, required=True)
+    interim.add_argument('--start', required=True, help="Дата начала, ГГГГ-ММ-ДД")
+    interim.add_argument('--end', required=True, help="Дата окончания, ГГГГ-ММ-ДД")
+    interim.add_argument('--incremental', action='store_true',
+                         help="Брать журнал оценок из --store, если он свежий")
+    add_output(interim)
+    interim.set_defaults(func=cmd_interim)
+
+    courses = subparsers.add_parser('courses', help="Курсы преподавателя за период")
+    courses.add_argument('--teacher-id', type=int, action='append', help="ID преподавателя (можно несколько)")
+    courses.add_argument('--teacher-email', action='append', help="Email преподавателя (можно несколько)")
+    courses.add_argument('--start', required=True, help="Дата начала, ГГГГ-ММ-ДД")
+    courses.add_argument('--end', required=True, help="Дата окончания, ГГГГ-ММ-ДД")
+    add_output(courses)
+    courses.set_defaults(func=cmd_courses)
+
+    serve = subparsers.add_parser('serve', help="HTTP-сервис отчетов с теплым клиентом")
+    serve.add_argument('--host', default='127.0.0.1')
+    serve.add_argument('--port', type=int, default=8765)
+    serve.add_argument('--prewarm', metavar='MANIFEST', help="Прогревать данные в фоне по манифесту целей")
+    serve.set_defaults(func=cmd_serve)
+
+    prewarm = subparsers.add_parser('prewarm', help="Прогрев кэша и хранилища перед сессией зачетов")
+    prewarm.add_argument('manifest', help="JSON-файл с целями и окнами прогрева")
+    prewarm.add_argument('--once', action='store_true', help="Один проход по открытым окнам")
+    prewarm.add_argument('--poll', type=float, default=30, help="Период проверки расписания, с")
+    prewarm.set_defaults(func=cmd_prewarm)
+
+    return parser
+
+
+def main(argv=None) -> int:
+    args = build_parser().parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
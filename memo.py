@@ -0,0 +1,135 @@
+import copy
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Iterable, Optional, Tuple
+
+# Время жизни метаданных курса в памяти процесса, в секундах
+DEFAULT_MEMO_TTL = 3600
+
+
+class _Flight:
+    """
+    Выполняющийся вызов, результат которого ждут остальные потоки
+    """
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+
+
+class SingleFlight:
+    """
+    Объединяет одинаковые одновременные вызовы: функцию выполняет первый поток,
+    остальные с тем же ключом ждут и получают копию его результата
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._flights: Dict[Hashable, _Flight] = {}
+
+    def do(self, key: Hashable, func: Callable[[], Any]) -> Tuple[Any, bool]:
+        """
+        Возвращает (результат, получен_от_другого_потока)
+        """
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            # Ответ отдается нескольким вызывающим, каждый получает свою копию
+            return copy.deepcopy(flight.result), True
+
+        try:
+            flight.result = func()
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._flights[key]
+            flight.done.set()
+        return flight.result, False
+
+    def in_flight(self) -> int:
+        with self._lock:
+            return len(self._flights)
+
+
+class LRUMemo:
+    """
+    Мемоизация метаданных в памяти процесса с TTL и вытеснением давно не использованных записей.
+    Ключи — кортежи (вид, id), например ('quizzes', course_id), ('group', group_id), ('user', user_id)
+    """
+
+    def __init__(self, max_entries: int = 50000, ttl: int = DEFAULT_MEMO_TTL):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._entries: 'OrderedDict[Tuple, Tuple[float, Any]]' = OrderedDict()
+
+    def get(self, key: Tuple) -> Tuple[bool, Any]:
+        """
+        Возвращает (найдено, значение). Просроченные записи удаляются
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] < time.time():
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return False, None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return True, entry[1]
+
+    def get_many(self, kind: str, ids: Iterable) -> Tuple[Dict, list]:
+        """
+        Возвращает найденные значения {id: значение} и список id, которых нет в памяти
+        """
+        found, missing = {}, []
+        for item_id in ids:
+            hit, value = self.get((kind, item_id))
+            if hit:
+                found[item_id] = value
+            else:
+                missing.append(item_id)
+        return found, missing
+
+    def set(self, key: Tuple, value: Any) -> None:
+        expires_at = time.time() + self.ttl
+        with self._lock:
+            self._entries[key] = (expires_at, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def set_many(self, kind: str, values: Dict) -> None:
+        for item_id, value in values.items():
+            self.set((kind, item_id), value)
+
+    def invalidate(self, kind: Optional[str] = None) -> int:
+        """
+        Сбрасывает записи одного вида или всю память. Возвращает количество удаленных записей
+        """
+        with self._lock:
+            if kind is None:
+                removed = len(self._entries)
+                self._entries.clear()
+                return removed
+            keys = [key for key in self._entries if key[0] == kind]
+            for key in keys:
+                del self._entries[key]
+            return len(keys)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {'entries': len(self._entries), 'hits': self.hits, 'misses': self.misses}
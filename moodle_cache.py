@@ -0,0 +1,201 @@
+import copy
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple, Any
+
+# Время жизни записей (в секундах) для медленно меняющихся функций API.
+# Функции, которых нет в словаре, не кэшируются.
+DEFAULT_TTLS = {
+    'core_group_get_group_members': 6 * 3600,
+    'core_user_get_users_by_field': 24 * 3600,
+    'core_group_get_groups': 24 * 3600,
+    'mod_quiz_get_quizzes_by_courses': 6 * 3600,
+    'core_enrol_get_users_courses': 12 * 3600,
+}
+
+# Служебные параметры, которые не должны попадать в ключ кэша
+EXCLUDED_PARAMS = ('wstoken', 'wsfunction', 'moodlewsrestformat')
+
+
+class ResponseCache:
+    """
+    Дисковый кэш ответов API на SQLite с TTL для каждой функции
+    и вытеснением давно не использованных записей
+    """
+
+    def __init__(self, path: str = 'moodle_cache.sqlite3', ttls: Optional[Dict[str, int]] = None,
+                 max_entries: int = 10000):
+        self.path = path
+        self.ttls = dict(DEFAULT_TTLS)
+        if ttls:
+            self.ttls.update(ttls)
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                function TEXT NOT NULL,
+                payload TEXT NOT NULL,
+                expires_at REAL NOT NULL,
+                accessed_at REAL NOT NULL
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_responses_function ON responses (function)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_responses_accessed ON responses (accessed_at)")
+        self._conn.commit()
+
+    @staticmethod
+    def make_key(function: str, params: Dict, namespace: str = '') -> str:
+        """
+        Строит ключ по имени функции и нормализованным параметрам (без токена)
+        """
+        normalized = sorted(
+            (str(key), str(value)) for key, value in params.items()
+            if key not in EXCLUDED_PARAMS
+        )
+        raw = json.dumps([namespace, function, normalized], ensure_ascii=False)
+        return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+    def is_cacheable(self, function: str) -> bool:
+        return self.ttls.get(function, 0) > 0
+
+    def get(self, function: str, params: Dict, namespace: str = '') -> Tuple[bool, Any]:
+        """
+        Возвращает (найдено, значение). Просроченные записи удаляются
+        """
+        key = self.make_key(function, params, namespace)
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT payload, expires_at FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return False, None
+            payload, expires_at = row
+            if expires_at < now:
+                self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self._conn.commit()
+                return False, None
+            self._conn.execute("UPDATE responses SET accessed_at = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+        return True, json.loads(payload)
+
+    def set(self, function: str, params: Dict, value: Any, namespace: str = '',
+            ttl: Optional[int] = None) -> None:
+        """
+        Сохраняет ответ API. ttl переопределяет время жизни функции по умолчанию
+        """
+        ttl = self.ttls.get(function, 0) if ttl is None else ttl
+        if ttl <= 0:
+            return
+        key = self.make_key(function, params, namespace)
+        now = time.time()
+        payload = json.dumps(value, ensure_ascii=False)
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, function, payload, expires_at, accessed_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (key, function, payload, now + ttl, now)
+            )
+            self._evict()
+            self._conn.commit()
+
+    def _evict(self) -> None:
+        """
+        Удаляет просроченные записи и самые старые по обращению сверх max_entries
+        """
+        self._conn.execute("DELETE FROM responses WHERE expires_at < ?", (time.time(),))
+        count = self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+        overflow = count - self.max_entries
+        if overflow > 0:
+            self._conn.execute(
+                "DELETE FROM responses WHERE key IN "
+                "(SELECT key FROM responses ORDER BY accessed_at ASC LIMIT ?)",
+                (overflow,)
+            )
+
+    def invalidate(self, function: Optional[str] = None, params: Optional[Dict] = None,
+                   namespace: str = '') -> int:
+        """
+        Сбрасывает кэш: одну запись (function + params), все записи функции или весь кэш.
+        Возвращает количество удаленных записей
+        """
+        with self._lock:
+            if function and params is not None:
+                cursor = self._conn.execute(
+                    "DELETE FROM responses WHERE key = ?",
+                    (self.make_key(function, params, namespace),)
+                )
+            elif function:
+                cursor = self._conn.execute("DELETE FROM responses WHERE function = ?", (function,))
+            else:
+                cursor = self._conn.execute("DELETE FROM responses")
+            self._conn.commit()
+            return cursor.rowcount
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+class MemoryResponseCache:
+    """
+    Кэш ответов API в памяти процесса с тем же интерфейсом, что и ResponseCache.
+    Нужен долгоживущему процессу (режим сервиса), где диск не требуется
+    """
+
+    def __init__(self, ttls: Optional[Dict[str, int]] = None, max_entries: int = 10000):
+        self.ttls = dict(DEFAULT_TTLS)
+        if ttls:
+            self.ttls.update(ttls)
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries: 'OrderedDict[str, Tuple[str, float, Any]]' = OrderedDict()
+
+    def is_cacheable(self, function: str) -> bool:
+        return self.ttls.get(function, 0) > 0
+
+    def get(self, function: str, params: Dict, namespace: str = '') -> Tuple[bool, Any]:
+        key = ResponseCache.make_key(function, params, namespace)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return False, None
+            if entry[1] < time.time():
+                del self._entries[key]
+                return False, None
+            self._entries.move_to_end(key)
+            return True, copy.deepcopy(entry[2])
+
+    def set(self, function: str, params: Dict, value: Any, namespace: str = '',
+            ttl: Optional[int] = None) -> None:
+        ttl = self.ttls.get(function, 0) if ttl is None else ttl
+        if ttl <= 0:
+            return
+        key = ResponseCache.make_key(function, params, namespace)
+        with self._lock:
+            self._entries[key] = (function, time.time() + ttl, copy.deepcopy(value))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, function: Optional[str] = None, params: Optional[Dict] = None,
+                   namespace: str = '') -> int:
+        with self._lock:
+            if function and params is not None:
+                return 1 if self._entries.pop(ResponseCache.make_key(function, params, namespace), None) else 0
+            if function:
+                keys = [key for key, entry in self._entries.items() if entry[0] == function]
+            else:
+                keys = list(self._entries)
+            for key in keys:
+                del self._entries[key]
+            return len(keys)
+
+    def close(self) -> None:
+        pass
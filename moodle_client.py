@@ -1,35 +1,284 @@
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from dotenv import load_dotenv
-from typing import List, Dict, Tuple, Optional, Union
+from typing import List, Dict, Tuple, Optional, Union, Iterator, Iterable
 from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+import itertools
 import os
+import re
+import time
+
+from moodle_cache import ResponseCache, MemoryResponseCache
+from grade_matrix import GradeMatrix
+from local_store import LocalStore
+from instrumentation import Instrumentation, metrics
+from json_stream import iter_json_array
+from memo import SingleFlight, LRUMemo
+from course_index import CourseIndex, period_timestamps
+from records import QuizAttempt, StudentResult, AttemptRecord, GradeEntry, StudentGrades, Course
+from run_checkpoint import RunCheckpoint
+from request_scheduler import RequestScheduler
 
 load_dotenv()
 
+EXECUTION_MODES = ('sequential', 'threads')
+
+# Источники лучших оценок: попытки каждого студента или журнал оценок курса
+GRADE_STRATEGIES = ('attempts', 'bulk')
+
+# grademethod теста Moodle: 1 — высшая оценка из попыток
+QUIZ_GRADE_HIGHEST = 1
+
+# Параметры-массивы вида values[0], groupids[3]
+ARRAY_PARAM_RE = re.compile(r'^(\w+)\[(\d+)\]$')
+
+RETRY_STATUSES = (500, 502, 503, 504)
+
+# Ответы, означающие перегрузку сервера: по ним планировщик снижает параллельность
+OVERLOAD_STATUSES = (429,) + RETRY_STATUSES
+
+# Размер фрагмента при потоковом чтении ответа, байт
+STREAM_CHUNK_SIZE = 64 * 1024
+
+# Виды записей LRUMemo, построенных из ответов функций API
+MEMO_KINDS = {
+    'mod_quiz_get_quizzes_by_courses': ('quizzes',),
+    'core_group_get_groups': ('group',),
+    'core_user_get_users_by_field': ('user', 'email'),
+}
+
+
 class MoodleClient:
-    def __init__(self):
-        self.url = os.getenv('MOODLE_URL')
-        self.token = os.getenv('MOODLE_TOKEN')
-        self.session = requests.Session()
+    def __init__(self, url: Optional[str] = None, token: Optional[str] = None,
+                 max_workers: int = 8, cache: Optional[Union[ResponseCache, MemoryResponseCache]] = None,
+                 timeout: Tuple[float, float] = (5, 60), retries: int = 3,
+                 backoff_factor: float = 0.5, chunk_size: int = 100,
+                 store: Optional[LocalStore] = None,
+                 instrumentation: Optional[Instrumentation] = None,
+                 memo: Optional[LRUMemo] = None,
+                 scheduler: Optional[RequestScheduler] = None,
+                 rate_limit: Optional[float] = None):
+        self.url = url or os.getenv('MOODLE_URL')
+        self.token = token or os.getenv('MOODLE_TOKEN')
+        self.max_workers = max_workers
+        self.cache = cache
+        self.timeout = timeout
+        self.chunk_size = chunk_size
+        self.store = store
+        self.instrumentation = instrumentation or metrics
+        self.single_flight = SingleFlight()
+        # Каталоги тестов, названия групп и имена пользователей на время жизни клиента
+        self.memo = memo if memo is not None else LRUMemo()
+        # Адаптивный предел одновременных запросов и лимит запросов в секунду
+        self.scheduler = scheduler or RequestScheduler(max_concurrency=max_workers, rate_limit=rate_limit)
+        self.session = self._build_session(retries, backoff_factor)
 
-    def call_api(self, function: str, **params) -> Optional[Dict]:
+    def _build_session(self, retries: int, backoff_factor: float) -> requests.Session:
+        """
+        Создает сессию с пулом keep-alive соединений и повторами с экспоненциальной задержкой
+        при ошибках соединения и ответах 5xx
+        """
+        retry = Retry(
+            total=retries,
+            connect=retries,
+            read=retries,
+            status=retries,
+            backoff_factor=backoff_factor,
+            status_forcelist=RETRY_STATUSES,
+            allowed_methods=frozenset(['GET', 'POST']),
+            raise_on_status=False
+        )
+        pool_size = max(10, self.max_workers)
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size,
+                              max_retries=retry, pool_block=True)
+        session = requests.Session()
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+        return session
+
+    def _chunk_params(self, params: Dict) -> List[Dict]:
+        """
+        Делит параметр-массив (values[i], groupids[i], ...) на части по chunk_size элементов.
+        Делится только единственный массив в запросе, остальные параметры копируются в каждую часть
+        """
+        arrays = {}
+        for key, value in params.items():
+            match = ARRAY_PARAM_RE.match(key)
+            if match:
+                arrays.setdefault(match.group(1), []).append((int(match.group(2)), key, value))
+
+        if len(arrays) != 1:
+            return [params]
+
+        name, items = next(iter(arrays.items()))
+        if len(items) <= self.chunk_size:
+            return [params]
+
+        items.sort()
+        common = {key: value for key, value in params.items()
+                  if key not in {item_key for _, item_key, _ in items}}
+        chunks = []
+        for start in range(0, len(items), self.chunk_size):
+            chunk = dict(common)
+            for i, (_, _, value) in enumerate(items[start:start + self.chunk_size]):
+                chunk[f"{name}[{i}]"] = value
+            chunks.append(chunk)
+        return chunks
+
+    @staticmethod
+    def _merge_responses(responses: List) -> Union[Dict, List, None]:
+        """
+        Объединяет ответы частей: списки склеиваются, у словарей склеиваются списочные поля
+        """
+        merged = responses[0]
+        for part in responses[1:]:
+            if isinstance(merged, list) and isinstance(part, list):
+                merged = merged + part
+            elif isinstance(merged, dict) and isinstance(part, dict):
+                for key, value in part.items():
+                    if isinstance(merged.get(key), list) and isinstance(value, list):
+                        merged[key] = merged[key] + value
+                    else:
+                        merged.setdefault(key, value)
+        return merged
+
+    def _post(self, function: str, params: Dict) -> Optional[Union[Dict, List]]:
+        """
+        Отправляет один POST-запрос к REST API Moodle
+        """
+        data = dict(params)
+        data.update({
+            'wstoken': self.token,
+            'wsfunction': function,
+            'moodlewsrestformat': 'json'
+        })
+        instrumentation = self.instrumentation
+        instrumentation.call_started(function, params)
+        slot = self.scheduler.acquire(function)
+        started = time.perf_counter()
+        nbytes, decode_time = 0, 0.0
+        try:
+            response = self.session.post(f"{self.url}/webservice/rest/server.php",
+                                         data=data, timeout=self.timeout)
+            response.raise_for_status()
+            nbytes = len(response.content)
+            decode_started = time.perf_counter()
+            result = response.json()
+            decode_time = time.perf_counter() - decode_started
+        except (requests.exceptions.RequestException, ValueError) as e:
+            print(f"API Error ({function}): {e}")
+            self.scheduler.release(function, slot, type(e).__name__, self._is_overload(e))
+            instrumentation.call_finished(function, time.perf_counter() - started, nbytes, decode_time,
+                                          error=type(e).__name__)
+            return None
+
+        error = None
+        if isinstance(result, dict) and 'exception' in result:
+            print(f"API Error ({function}): {result.get('message')}")
+            error = result.get('errorcode') or result.get('exception')
+        self.scheduler.release(function, slot, error)
+        instrumentation.call_finished(function, time.perf_counter() - started, nbytes, decode_time, error)
+        return result
+
+    @staticmethod
+    def _is_overload(error: Exception) -> bool:
+        """
+        Ошибка связана с нагрузкой на сервер, а не с запросом
+        """
+        if isinstance(error, requests.exceptions.HTTPError) and error.response is not None:
+            return error.response.status_code in OVERLOAD_STATUSES
+        return isinstance(error, (requests.exceptions.ConnectionError, requests.exceptions.Timeout,
+                                  requests.exceptions.RetryError))
+
+    def call_api_stream(self, function: str, **params) -> Optional[Iterator[bytes]]:
         """
-        Получаем данные из API
+        Выполняет запрос к API и возвращает тело ответа потоком фрагментов байтов,
+        не загружая его в память целиком. Кэш и деление массивов не применяются
         """
-        params.update({
+        data = dict(params)
+        data.update({
             'wstoken': self.token,
             'wsfunction': function,
             'moodlewsrestformat': 'json'
         })
+        instrumentation = self.instrumentation
+        instrumentation.call_started(function, params)
+        slot = self.scheduler.acquire(function)
+        started = time.perf_counter()
         try:
-            response = self.session.get(f"{self.url}/webservice/rest/server.php",
-                                        params=params)
+            response = self.session.post(f"{self.url}/webservice/rest/server.php",
+                                         data=data, timeout=self.timeout, stream=True)
             response.raise_for_status()
-            return response.json()
         except requests.exceptions.RequestException as e:
-            print(f"API Error: {e}")
+            print(f"API Error ({function}): {e}")
+            self.scheduler.release(function, slot, type(e).__name__, self._is_overload(e))
+            instrumentation.call_finished(function, time.perf_counter() - started, error=type(e).__name__)
             return None
 
+        # Место в планировщике освобождается с получением заголовков: тело читает вызывающий
+        # в своем темпе и может делать другие запросы, пока поток не дочитан
+        self.scheduler.release(function, slot)
+
+        def chunks() -> Iterator[bytes]:
+            nbytes, error = 0, None
+            try:
+                for chunk in response.iter_content(chunk_size=STREAM_CHUNK_SIZE):
+                    nbytes += len(chunk)
+                    yield chunk
+            except requests.exceptions.RequestException as e:
+                error = type(e).__name__
+                raise
+            finally:
+                response.close()
+                instrumentation.call_finished(function, time.perf_counter() - started, nbytes, error=error)
+
+        return chunks()
+
+    def call_api(self, function: str, **params) -> Optional[Dict]:
+        """
+        Получаем данные из API (POST, большие массивы id делятся на части по chunk_size).
+        Если у клиента задан cache, ответы медленно меняющихся функций берутся из него.
+        Одинаковые одновременные вызовы выполняются одним запросом
+        """
+        use_cache = self.cache is not None and self.cache.is_cacheable(function)
+        if use_cache:
+            found, cached = self.cache.get(function, params, namespace=self.url or '')
+            if found:
+                self.instrumentation.cache_hit(function)
+                return cached
+
+        key = ResponseCache.make_key(function, params, namespace=self.url or '')
+        data, shared = self.single_flight.do(key, lambda: self._fetch(function, params, use_cache))
+        if shared:
+            self.instrumentation.call_coalesced(function)
+        return data
+
+    def invalidate_memo(self, function: Optional[str] = None) -> int:
+        """
+        Сбрасывает метаданные в памяти клиента, полученные из function (или все).
+        Возвращает количество удаленных записей
+        """
+        if function is None:
+            return self.memo.invalidate()
+        return sum(self.memo.invalidate(kind) for kind in MEMO_KINDS.get(function, ()))
+
+    def _fetch(self, function: str, params: Dict, use_cache: bool) -> Optional[Union[Dict, List]]:
+        responses = []
+        for chunk in self._chunk_params(params):
+            part = self._post(function, chunk)
+            if part is None:
+                return None
+            if isinstance(part, dict) and 'exception' in part:
+                return part
+            responses.append(part)
+        data = self._merge_responses(responses)
+
+        if use_cache and data is not None and not (isinstance(data, dict) and 'exception' in data):
+            self.cache.set(function, params, data, namespace=self.url or '')
+        return data
+
     def get_user_id_by_username(self, username: str) -> Optional[int]:
         """
         Получает ID пользователя по его имени (username).
@@ -60,44 +309,94 @@ class MoodleClient:
             print(f"Ответ API: {response}")
             return None
 
-    def get_teacher_courses(self, teacher_id: int, start_date: str, end_date: str) -> Optional[Tuple[List[Dict], int]]:
+    def get_user_ids_by_emails(self, emails: List[str]) -> Dict[str, Optional[int]]:
         """
-        Получает список курсов преподавателя за указанный период
+        Находит ID пользователей по списку email запросами core_user_get_users_by_field
+        (массив values делится на части по chunk_size). Для ненайденных — None
         """
-        try:
-            start_dt = datetime.strptime(start_date, "%Y-%m-%d")
-            end_dt = datetime.strptime(end_date, "%Y-%m-%d")
+        if not emails:
+            return {}
+        keys = {email: email.strip().lower() for email in emails}
+        found, missing = self.memo.get_many('email', dict.fromkeys(keys.values()))
 
-            if start_dt > end_dt:
-                raise ValueError("Дата начала периода не может быть позже даты окончания")
+        if missing:
+            params = {'field': 'email'}
+            for i, email in enumerate(missing):
+                params[f'values[{i}]'] = email
+            result = self.call_api('core_user_get_users_by_field', **params)
 
-            start_timestamp = int(start_dt.timestamp())
-            end_timestamp = int(end_dt.timestamp())
+            if isinstance(result, list):
+                fetched = {user['email'].lower(): user['id'] for user in result
+                           if isinstance(user, dict) and user.get('email')}
+                self.memo.set_many('email', fetched)
+                found.update(fetched)
+            elif isinstance(result, dict) and 'exception' in result:
+                print(f"Ошибка API: {result.get('message')}")
 
-            all_courses = self.call_api('core_enrol_get_users_courses', userid=teacher_id)
-            if not isinstance(all_courses, list):
-                return None
+        ids = {email: found.get(key) for email, key in keys.items()}
+        for email, user_id in ids.items():
+            if user_id is None:
+                print(f"Пользователь с email {email} не найден.")
+        return ids
 
-            filtered_courses = []
-            for course in all_courses:
-                if not all(key in course for key in ['id', 'fullname', 'startdate']):
-                    continue
+    def get_user_courses(self, user_id: int) -> Optional[List[Dict]]:
+        """
+        Все курсы, на которые записан пользователь (без фильтра по датам)
+        """
+        courses = self.call_api('core_enrol_get_users_courses', userid=user_id)
+        if not isinstance(courses, list):
+            return None
+        return courses
+
+    def build_course_index(self, teacher_ids: List[int], index: Optional[CourseIndex] = None,
+                           mode: str = 'threads', max_workers: Optional[int] = None) -> CourseIndex:
+        """
+        Загружает курсы преподавателей параллельно и складывает их в общий индекс.
+        Преподаватели, уже загруженные в переданный index, повторно не запрашиваются
+        """
+        index = index if index is not None else CourseIndex()
+        pending = [teacher_id for teacher_id in dict.fromkeys(teacher_ids) if teacher_id not in index]
+        results = self.map_calls(self.get_user_courses, [(teacher_id,) for teacher_id in pending],
+                                 mode=mode, max_workers=max_workers)
+        for teacher_id, courses in zip(pending, results):
+            if courses is None:
+                print(f"Не удалось получить курсы преподавателя {teacher_id}")
+                continue
+            index.add(teacher_id, courses)
+        return index
+
+    def get_teachers_courses(self, teacher_ids: List[int], start_date: str, end_date: str,
+                             mode: str = 'threads', max_workers: Optional[int] = None,
+                             index: Optional[CourseIndex] = None) -> Optional[Dict[int, Tuple[List[Course], int]]]:
+        """
+        Курсы нескольких преподавателей за период: {teacher_id: (курсы, количество)}
+        """
+        try:
+            period_timestamps(start_date, end_date)
+        except ValueError as e:
+            print(f"Ошибка формата даты: {e}")
+            return None
 
-                course_start = course.get('startdate', 0)
-                course_end = course.get('enddate', float('inf'))
+        index = self.build_course_index(teacher_ids, index, mode, max_workers)
+        return {
+            teacher_id: index.teacher_courses(teacher_id, start_date, end_date)
+            for teacher_id in dict.fromkeys(teacher_ids) if teacher_id in index
+        }
 
-                if (course_start >= start_timestamp and
-                        (course_end <= end_timestamp or course_end == 0)):
-                    filtered_courses.append({
-                        'id': course['id'],
-                        'fullname': course['fullname'],
-                        'startdate': datetime.fromtimestamp(course_start).strftime('%Y-%m-%d'),
-                        'enddate': datetime.fromtimestamp(course_end).strftime('%Y-%m-%d')
-                        if course_end and course_end != float('inf')
-                        else 'Не указана'
-                    })
+    def get_teacher_courses(self, teacher_id: int, start_date: str, end_date: str) -> Optional[Tuple[List[Course], int]]:
+        """
+        Получает список курсов преподавателя за указанный период
+        """
+        try:
+            period_timestamps(start_date, end_date)
 
-            return filtered_courses, len(filtered_courses)
+            all_courses = self.get_user_courses(teacher_id)
+            if all_courses is None:
+                return None
+
+            index = CourseIndex()
+            index.add(teacher_id, all_courses)
+            return index.teacher_courses(teacher_id, start_date, end_date)
 
         except ValueError as e:
             print(f"Ошибка формата даты: {e}")
@@ -106,15 +405,166 @@ class MoodleClient:
             print(f"Ошибка при получении курсов: {e}")
             return None
 
-    def track_interim_assessment(self, course_id: int, start_date_str: str, end_date_str: str) -> Optional[Dict]:
+    def _load_grade_items(self, course_id: int, incremental: bool = False,
+                          max_age: float = 3600) -> Optional[Dict]:
+        """
+        Журнал оценок курса. В инкрементальном режиме берется из локального хранилища,
+        если снимок моложе max_age секунд, иначе загружается и сохраняется заново
+        """
+        if incremental and self.store is not None:
+            snapshot = self.store.get_grade_report(course_id)
+            if snapshot and time.time() - snapshot[1] < max_age:
+                return snapshot[0]
+
+        started = time.time()
+        grades_data = self.call_api('gradereport_user_get_grade_items', courseid=course_id)
+        if incremental and self.store is not None and isinstance(grades_data, dict) \
+                and 'usergrades' in grades_data:
+            self.store.save_grade_report(course_id, grades_data, synced_at=started)
+        return grades_data
+
+    def sync_grade_report(self, course_id: int) -> bool:
+        """
+        Загружает журнал оценок курса в локальное хранилище (store) для инкрементальных отчетов
+        """
+        if self.store is None:
+            raise ValueError("Для сохранения журнала оценок нужно локальное хранилище (store)")
+        grades_data = self._load_grade_items(course_id, incremental=True, max_age=0)
+        return isinstance(grades_data, dict) and 'usergrades' in grades_data
+
+    @staticmethod
+    def _interim_item_info(item: Dict, start_date: datetime, end_date: datetime) -> Optional[Dict]:
+        """
+        Описание элемента оценивания для отчета или None, если элемент не входит в период
+        """
+        item_id = item.get('id')
+        try:
+            if not item.get('itemname'):
+                return None
+
+            item_info = {
+                'id': item_id,
+                'name': item.get('itemname', 'Без названия'),
+                'type': item.get('itemtype', 'unknown'),
+                'max_grade': item.get('grademax', 0)
+            }
+
+            if not item.get('gradedatesubmitted'):
+                item_info['date'] = 'Дата не указана'
+                return item_info
+
+            item_date = datetime.fromtimestamp(int(item['gradedatesubmitted']))
+            if start_date <= item_date <= end_date:
+                item_info['date'] = item_date.strftime('%Y-%m-%d')
+                return item_info
+
+        except Exception as e:
+            print(f"Ошибка обработки элемента оценки {item_id}: {e}")
+
+        return None
+
+    def _iter_interim_students(self, usergrades: Iterable[Dict], start_date: datetime, end_date: datetime,
+                               interim_items: List[Dict], items_by_id: Dict) -> Iterator[StudentGrades]:
+        """
+        Генератор отчета по одному студенту. Каталог элементов пополняется по мере
+        первого появления элемента, как и в обычном режиме
+        """
+        positions = {}
+        for student in usergrades:
+            try:
+                grades = []
+                for grade_item in student.get('gradeitems', []):
+                    item_id = grade_item['id']
+                    if item_id not in positions:
+                        item_info = self._interim_item_info(grade_item, start_date, end_date)
+                        positions[item_id] = len(interim_items) if item_info else None
+                        if item_info:
+                            interim_items.append(item_info)
+                            items_by_id[item_id] = item_info
+                    position = positions[item_id]
+                    if position is None:
+                        continue
+                    grades.append((position, GradeEntry(
+                        item_id,
+                        interim_items[position]['name'],
+                        grade_item.get('gradeformatted', '-'),
+                        grade_item.get('percentageformatted', '-'),
+                        grade_item.get('graderaw')
+                    )))
+
+                grades.sort(key=lambda x: x[0])
+                yield StudentGrades(student['userid'], student['userfullname'],
+                                    [grade for _, grade in grades])
+            except Exception as e:
+                print(f"Ошибка обработки студента {student.get('userid')}: {e}")
+                continue
+
+    @staticmethod
+    def _stream_usergrades(chunks: Iterator[bytes]) -> Iterator[Dict]:
+        try:
+            yield from iter_json_array(chunks, 'usergrades')
+        except ValueError as e:
+            print(f"Ошибка разбора журнала оценок: {e}")
+
+    def track_interim_assessment(self, course_id: int, start_date_str: str, end_date_str: str,
+                                 incremental: bool = False, max_age: float = 3600,
+                                 streaming: bool = False) -> Optional[Dict]:
         """
-        Получение информации о промежуточной аттестации
+        Получение информации о промежуточной аттестации.
+        incremental=True использует журнал оценок из локального хранилища (store), если он свежий.
+        streaming=True разбирает ответ потоково: students_grades становится генератором,
+        а interim_items заполняется по мере его чтения (студенты до первого подходящего
+        элемента читаются заранее). С incremental не сочетается:
+        журнал из хранилища и так загружается целиком
         """
+        if streaming and incremental:
+            raise ValueError("streaming не используется вместе с incremental")
+
         try:
             start_date = datetime.strptime(start_date_str, "%Y-%m-%d")
             end_date = datetime.strptime(end_date_str, "%Y-%m-%d")
 
-            grades_data = self.call_api('gradereport_user_get_grade_items', courseid=course_id)
+            if streaming:
+                chunks = self.call_api_stream('gradereport_user_get_grade_items', courseid=course_id)
+                if chunks is None:
+                    print("API не вернуло данных")
+                    return None
+
+                # Первый студент читается сразу: ошибка API или пустой журнал дают None, как без streaming
+                usergrades = self._stream_usergrades(chunks)
+                first = next(usergrades, None)
+                if first is None:
+                    print("Нет данных об оценках студентов")
+                    return None
+
+                # Студенты буферизуются до первого элемента в периоде: если его нет во всем
+                # журнале, возвращается None, как без streaming
+                interim_items, items_by_id = [], {}
+                students = self._iter_interim_students(
+                    itertools.chain([first], usergrades), start_date, end_date, interim_items, items_by_id
+                )
+                buffered = []
+                for student_grades in students:
+                    buffered.append(student_grades)
+                    if interim_items:
+                        break
+                if not interim_items:
+                    print("Нет подходящих элементов оценивания")
+                    return None
+
+                return {
+                    'course_id': course_id,
+                    'interim_items': interim_items,
+                    'items_by_id': items_by_id,
+                    'students_grades': itertools.chain(buffered, students),
+                    'period': {
+                        'start': start_date_str,
+                        'end': end_date_str
+                    },
+                    'note': 'Элементы без даты включены в отчет'
+                }
+
+            grades_data = self._load_grade_items(course_id, incremental, max_age)
             if not grades_data:
                 print("API не вернуло данных")
                 return None
@@ -123,71 +573,38 @@ class MoodleClient:
                 print("Нет данных об оценках студентов")
                 return None
 
-            unique_items = {}
-            for user in grades_data['usergrades']:
-                for item in user.get('gradeitems', []):
-                    item_id = item['id']
-                    if item_id not in unique_items:
-                        unique_items[item_id] = item
+            matrix = GradeMatrix.from_usergrades(grades_data['usergrades'])
 
             interim_items = []
-            for item_id, item in unique_items.items():
-                try:
-                    if not item.get('itemname'):
-                        continue
-
-                    item_info = {
-                        'id': item_id,
-                        'name': item.get('itemname', 'Без названия'),
-                        'type': item.get('itemtype', 'unknown'),
-                        'max_grade': item.get('grademax', 0)
-                    }
-
-                    if not item.get('gradedatesubmitted'):
-                        item_info['date'] = 'Дата не указана'
-                        interim_items.append(item_info)
-                    else:
-                        item_date = datetime.fromtimestamp(int(item['gradedatesubmitted']))
-                        if start_date <= item_date <= end_date:
-                            item_info['date'] = item_date.strftime('%Y-%m-%d')
-                            interim_items.append(item_info)
-
-                except Exception as e:
-                    print(f"Ошибка обработки элемента оценки {item_id}: {e}")
-                    continue
+            for item in matrix.items:
+                item_info = self._interim_item_info(item, start_date, end_date)
+                if item_info:
+                    interim_items.append(item_info)
 
             if not interim_items:
                 print("Нет подходящих элементов оценивания")
                 return None
 
+            report_matrix = matrix.select_items([item['id'] for item in interim_items], interim_items)
+
             students_grades = []
-            for student in grades_data['usergrades']:
-                try:
-                    student_data = {
-                        'userid': student['userid'],
-                        'userfullname': student['userfullname'],
-                        'grades': []
-                    }
-
-                    for item in interim_items:
-                        for grade_item in student['gradeitems']:
-                            if grade_item['id'] == item['id']:
-                                student_data['grades'].append({
-                                    'item': item['name'],
-                                    'grade': grade_item.get('gradeformatted', '-'),
-                                    'percentage': grade_item.get('percentageformatted', '-')
-                                })
-                                break
-
-                    students_grades.append(student_data)
-                except Exception as e:
-                    print(f"Ошибка обработки студента {student.get('userid')}: {e}")
-                    continue
+            for row, user_id, user_name, cols in report_matrix.iter_rows():
+                students_grades.append(StudentGrades(user_id, user_name, [
+                    GradeEntry(
+                        interim_items[col]['id'],
+                        interim_items[col]['name'],
+                        report_matrix.grades[row, col],
+                        report_matrix.percentages[row, col],
+                        report_matrix.raw[row, col]
+                    )
+                    for col in cols
+                ]))
 
             return {
                 'course_id': course_id,
                 'interim_items': interim_items,
                 'students_grades': students_grades,
+                'matrix': report_matrix,
                 'period': {
                     'start': start_date_str,
                     'end': end_date_str
@@ -199,26 +616,40 @@ class MoodleClient:
             print(f"Ошибка при формировании отчета: {str(e)}")
             return None
 
-    def get_quiz_info(self, quiz_ids: List, course_id: int) -> Dict:
+    def get_course_quizzes(self, course_id: int) -> Optional[Dict[int, Dict]]:
         """
-        Получаем информацию о конкретных тестах
+        Каталог тестов курса {quiz_id: тест}, запоминается в памяти клиента
         """
-        if not quiz_ids:
-            print("Не переданы ID тестов")
-            return {}
+        found, quizzes = self.memo.get(('quizzes', course_id))
+        if found:
+            return quizzes
 
         all_quizzes = self.call_api("mod_quiz_get_quizzes_by_courses", **{"courseids[0]": course_id})
 
         if not all_quizzes:
             print(f"Не удалось получить тесты для курса {course_id}")
-            return {}
+            return None
 
         if 'quizzes' not in all_quizzes:
             print(f"Неожиданный формат ответа: {all_quizzes}")
+            return None
+
+        quizzes = {q['id']: q for q in all_quizzes.get('quizzes', [])}
+        self.memo.set(('quizzes', course_id), quizzes)
+        return quizzes
+
+    def get_quiz_info(self, quiz_ids: List, course_id: int) -> Dict:
+        """
+        Получаем информацию о конкретных тестах
+        """
+        if not quiz_ids:
+            print("Не переданы ID тестов")
             return {}
 
-        quizzes = all_quizzes.get('quizzes', [])
-        return {q['id']: q for q in quizzes if q['id'] in quiz_ids}
+        quizzes = self.get_course_quizzes(course_id)
+        if not quizzes:
+            return {}
+        return {quiz_id: quizzes[quiz_id] for quiz_id in quiz_ids if quiz_id in quizzes}
 
     def get_group_students(self, group_id: int) -> List[int]:
         """
@@ -244,80 +675,484 @@ class MoodleClient:
             print(f"Ошибка при получении студентов: {str(e)}")
             return []
 
+    def get_groups_students(self, group_ids: List[int]) -> Dict[int, List[int]]:
+        """
+        Получаем ID студентов сразу для нескольких групп одним запросом
+        """
+        if not group_ids:
+            return {}
+        try:
+            params = {f"groupids[{i}]": group_id for i, group_id in enumerate(group_ids)}
+            result = self.call_api("core_group_get_group_members", **params)
+
+            if not isinstance(result, list):
+                print("Пустой ответ от API")
+                return {}
+
+            members = {}
+            for item in result:
+                if isinstance(item, dict) and isinstance(item.get('userids'), list):
+                    members[item.get('groupid')] = [uid for uid in item['userids'] if isinstance(uid, int)]
+            return members
+
+        except Exception as e:
+            print(f"Ошибка при получении студентов: {str(e)}")
+            return {}
+
     def get_student_names(self, user_ids: List) -> Dict:
         """
-        Получаем имена студентов
+        Получаем имена студентов. Из API запрашиваются только имена, которых нет в памяти клиента
         """
         if not user_ids:
             return {}
+        names, missing = self.memo.get_many('user', dict.fromkeys(user_ids))
+        if not missing:
+            return names
+
         params = {'field': 'id'}
-        for i, user_id in enumerate(user_ids):
+        for i, user_id in enumerate(missing):
             params[f'values[{i}]'] = user_id
 
         result = self.call_api("core_user_get_users_by_field", **params)
-        return {u['id']: f"{u['firstname']} {u['lastname']}" for u in result} if result else {}
+        if result:
+            fetched = {u['id']: f"{u['firstname']} {u['lastname']}" for u in result}
+            self.memo.set_many('user', fetched)
+            names.update(fetched)
+        return names
+
+    @staticmethod
+    def _finished_attempts(quiz_id: int, raw_attempts: List[Dict]) -> List[QuizAttempt]:
+        """
+        Оставляет только завершенные попытки без изменения оригинальных оценок
+        """
+        attempts = []
+        for attempt in raw_attempts:
+            if attempt.get('state') == 'finished':
+                raw_grade = attempt.get('sumgrades')
+                attempts.append(QuizAttempt(quiz_id, raw_grade,
+                                            float(raw_grade) if raw_grade is not None else 0.0))
+        return attempts
+
+    def _try_quiz_attempts(self, user_id: int, quiz_id: int) -> Tuple[Optional[List[QuizAttempt]], Optional[str]]:
+        """
+        Завершенные попытки студента по тесту и текст ошибки.
+        При неудачной загрузке попытки равны None, а не пустому списку
+        """
+        try:
+            result = self.call_api("mod_quiz_get_user_attempts",
+                                   quizid=quiz_id,
+                                   userid=user_id)
+        except Exception as e:
+            print(f"Ошибка в получении оценок {user_id}: {str(e)}")
+            return None, str(e)
+
+        if result is None:
+            return None, 'нет ответа API'
+        if isinstance(result, dict) and 'exception' in result:
+            return None, result.get('message') or result['exception']
+        if not isinstance(result, dict) or 'attempts' not in result:
+            return None, 'неожиданный формат ответа'
+        return self._finished_attempts(quiz_id, result['attempts']), None
+
+    def _fetch_quiz_attempts(self, user_id: int, quiz_id: int) -> List[QuizAttempt]:
+        """
+        Получает завершенные попытки одного студента по одному тесту
+        """
+        return self._try_quiz_attempts(user_id, quiz_id)[0] or []
+
+    def _sync_pair(self, user_id: int, quiz_id: int, started: float) -> bool:
+        """
+        Загружает все попытки пары (студент, тест) в локальное хранилище
+        """
+        result = self.call_api("mod_quiz_get_user_attempts",
+                               quizid=quiz_id,
+                               userid=user_id,
+                               status='all')
+        if not isinstance(result, dict) or 'attempts' not in result:
+            print(f"Не удалось синхронизировать попытки студента {user_id} по тесту {quiz_id}")
+            return False
+
+        self.store.save_attempts(user_id, quiz_id, result['attempts'], synced_at=started)
+        return True
+
+    def _quiz_grades_modified(self, course_id: int, group_id: Optional[int] = None) -> Optional[Dict[Tuple[int, int], int]]:
+        """
+        Время последнего изменения оценки за тест для каждой пары (студент, тест)
+        по одному запросу журнала оценок курса (группы)
+        """
+        params = {'courseid': course_id}
+        if group_id:
+            params['groupid'] = group_id
+        grades_data = self.call_api('gradereport_user_get_grade_items', **params)
+        if not isinstance(grades_data, dict) or 'usergrades' not in grades_data:
+            return None
+
+        modified = {}
+        for user in grades_data['usergrades']:
+            for item in user.get('gradeitems', []):
+                if item.get('itemmodule') == 'quiz':
+                    modified[(user.get('userid'), item.get('iteminstance'))] = item.get('gradedatemodified') or 0
+        return modified
+
+    def sync_attempts(self, pairs: List[Tuple[int, int]], course_id: int, group_id: Optional[int] = None,
+                      max_age: float = 3600, mode: str = 'sequential',
+                      max_workers: Optional[int] = None) -> Dict[Tuple[int, int], Optional[List[QuizAttempt]]]:
+        """
+        Инкрементальная синхронизация попыток через локальное хранилище (store).
+        Заново запрашиваются только пары, которые еще не загружались, имели незавершенные
+        попытки или чья оценка в журнале изменилась после последней загрузки. Если журнал
+        недоступен, пары обновляются не чаще раза в max_age секунд.
+        Для пар, которые не удалось загрузить и которых нет в хранилище, значение — None
+        """
+        if self.store is None:
+            raise ValueError("Для инкрементальной синхронизации нужно локальное хранилище (store)")
+
+        unique_pairs = list(dict.fromkeys(pairs))
+        state = self.store.get_attempts_state(unique_pairs)
+        modified = self._quiz_grades_modified(course_id, group_id) if state else None
+        now = time.time()
+
+        stale = []
+        for pair in unique_pairs:
+            if pair not in state:
+                stale.append(pair)
+                continue
+            synced_at, has_open = state[pair]
+            if has_open:
+                stale.append(pair)
+            elif modified is not None:
+                if modified.get(pair, 0) >= synced_at:
+                    stale.append(pair)
+            elif now - synced_at > max_age:
+                stale.append(pair)
+
+        if stale:
+            print(f"Синхронизация попыток: {len(stale)} из {len(unique_pairs)}")
+        synced = self.map_calls(self._sync_pair, [(user_id, quiz_id, now) for user_id, quiz_id in stale],
+                                mode, max_workers)
+        failed = sum(not ok for ok in synced)
+        if failed:
+            print(f"Не удалось синхронизировать попытки для {failed} из {len(stale)} пар (студент, тест)")
+
+        attempts = {}
+        for user_id, quiz_id in unique_pairs:
+            # Если синхронизация не удалась, используется прежний снимок; без него пара считается незагруженной
+            stored = self.store.get_attempts(user_id, quiz_id)
+            attempts[(user_id, quiz_id)] = self._finished_attempts(quiz_id, stored) if stored is not None else None
+        return attempts
+
+    def map_calls(self, func, args_list: List[Tuple], mode: str = 'sequential',
+                  max_workers: Optional[int] = None) -> List:
+        """
+        Выполняет func для каждого набора аргументов последовательно или в пуле потоков.
+        Порядок результатов совпадает с порядком args_list
+        """
+        if mode not in EXECUTION_MODES:
+            raise ValueError(f"Неизвестный режим выполнения: {mode}. Допустимые: {', '.join(EXECUTION_MODES)}")
+
+        if mode == 'sequential' or len(args_list) < 2:
+            return [func(*args) for args in args_list]
+
+        workers = max(1, min(max_workers or self.max_workers, len(args_list)))
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            return list(executor.map(lambda args: func(*args), args_list))
 
-    def get_user_quiz_attempts(self, user_id: int, quiz_ids: List[int]) -> List[Dict]:
+    def get_user_quiz_attempts(self, user_id: int, quiz_ids: List[int]) -> List[QuizAttempt]:
         """
         Получает попытки тестов без изменения оригинальных оценок
         """
         attempts = []
         for quiz_id in quiz_ids:
-            try:
-                result = self.call_api("mod_quiz_get_user_attempts",
-                                       quizid=quiz_id,
-                                       userid=user_id)
-
-                if result and 'attempts' in result:
-                    for attempt in result['attempts']:
-                        if attempt.get('state') == 'finished':
-                            raw_grade = attempt.get('sumgrades')
-                            max_grade = attempt.get('totalmarks')
-
-                            attempts.append({
-                                'quiz_id': quiz_id,
-                                'raw_grade': raw_grade,
-                                'grade': float(raw_grade) if raw_grade is not None else 0.0,
-                            })
-            except Exception as e:
-                print(f"Ошибка в получении оценок {user_id}: {str(e)}")
+            attempts.extend(self._fetch_quiz_attempts(user_id, quiz_id))
 
         return attempts
 
-    def analyze_attempts_results(self, quiz_ids: List[int], group_id: int, course_id: int) -> List[Dict]:
+    def _collect_attempts(self, pairs: List[Tuple[int, int]], mode: str = 'sequential',
+                          max_workers: Optional[int] = None,
+                          checkpoint: Optional[RunCheckpoint] = None) -> Dict[Tuple[int, int], Optional[List[QuizAttempt]]]:
         """
-        Анализирует все попытки по всем указанным тестам и возвращает максимальную оценку
+        Загружает попытки для пар (студент, тест), каждую уникальную пару — один раз.
+        Для пар, которые не удалось загрузить, значение — None.
+        С checkpoint результат каждой пары сохраняется сразу, а уже загруженные
+        в этом запуске пары берутся из него без запросов
         """
-        students = self.get_group_students(group_id)
-        if not students:
-            return []
+        unique_pairs = list(dict.fromkeys(pairs))
+        attempts = {}
+        if checkpoint is not None:
+            completed = checkpoint.completed()
+            attempts = {pair: completed[pair] for pair in unique_pairs if pair in completed}
+            if attempts:
+                print(f"Продолжение запуска {checkpoint.run_id}: готово {len(attempts)} "
+                      f"из {len(unique_pairs)} пар")
+        pending = [pair for pair in unique_pairs if pair not in attempts]
 
-        student_names = self.get_student_names(students)
-        results = []
+        def fetch(user_id: int, quiz_id: int) -> Optional[List[QuizAttempt]]:
+            result, error = self._try_quiz_attempts(user_id, quiz_id)
+            if checkpoint is not None:
+                checkpoint.save_pair(user_id, quiz_id, result, error)
+            return result
+
+        fetched = self.map_calls(fetch, pending, mode, max_workers)
+        attempts.update(zip(pending, fetched))
 
+        failed = sum(result is None for result in fetched)
+        if failed:
+            print(f"Не удалось загрузить попытки для {failed} из {len(unique_pairs)} пар (студент, тест)")
+        return attempts
+
+    @staticmethod
+    def _clean_name(raw_name: str) -> str:
+        return raw_name.split('@')[0].strip() if '@' in raw_name else raw_name
+
+    @classmethod
+    def _best_grades(cls, students: List[int], quiz_ids: List[int], student_names: Dict,
+                     attempts: Dict[Tuple[int, int], Optional[List[QuizAttempt]]]) -> List[StudentResult]:
+        """
+        Собирает лучшую оценку каждого студента по указанным тестам.
+        Тесты, попытки по которым не загрузились, перечисляются в failed_quiz_ids;
+        если не загрузился ни один, лучшая оценка — None, а не 0.0
+        """
+        results = []
         for user_id in students:
             all_attempts = []
-
+            failed = []
             for quiz_id in quiz_ids:
-                attempts = self.get_user_quiz_attempts(user_id, [quiz_id])
-                all_attempts.extend(attempts)
+                quiz_attempts = attempts.get((user_id, quiz_id), [])
+                if quiz_attempts is None:
+                    failed.append(quiz_id)
+                    continue
+                all_attempts.extend(quiz_attempts)
 
-            raw_name = student_names.get(user_id, "Неизвестный")
-            clean_name = raw_name.split('@')[0].strip() if '@' in raw_name else raw_name
+            clean_name = cls._clean_name(student_names.get(user_id, "Неизвестный"))
 
             if all_attempts:
-                best_grade = max(attempt['grade'] for attempt in all_attempts)
-                results.append({
-                    'user_name': clean_name,
-                    'best_grade': best_grade
-                })
+                best_grade = max(attempt.grade for attempt in all_attempts)
+                results.append(StudentResult(clean_name, best_grade, tuple(failed)))
+            elif failed:
+                results.append(StudentResult(clean_name, None, tuple(failed)))
             else:
-                results.append({
-                    'user_name': clean_name,
-                    'best_grade': 0.0
-                })
+                results.append(StudentResult(clean_name, 0.0))
 
-        return sorted(results, key=lambda x: x['user_name'])
+        return sorted(results, key=lambda x: x.user_name)
+
+    def _bulk_quiz_grades(self, students: List[int], quiz_ids: List[int], course_id: int,
+                          group_id: Optional[int] = None) -> Tuple[Dict[Tuple[int, int], List[QuizAttempt]], List[int]]:
+        """
+        Лучшие оценки за тесты из одного запроса журнала оценок курса (группы).
+        Подходят только тесты с оценкой по высшей попытке: оценка журнала переводится
+        обратно в баллы попытки (sumgrades), чтобы совпадать с оценками по попыткам.
+        Возвращает оценки в формате попыток и список обработанных тестов
+        """
+        quizzes = self.get_quiz_info(quiz_ids, course_id)
+        bulk_quizzes = {
+            quiz_id: quiz for quiz_id, quiz in quizzes.items()
+            if quiz.get('grademethod') == QUIZ_GRADE_HIGHEST
+            and float(quiz.get('grade') or 0) > 0 and float(quiz.get('sumgrades') or 0) > 0
+        }
+        if not bulk_quizzes:
+            return {}, []
+
+        params = {'courseid': course_id}
+        if group_id:
+            params['groupid'] = group_id
+        grades_data = self.call_api('gradereport_user_get_grade_items', **params)
+        if not isinstance(grades_data, dict) or 'usergrades' not in grades_data:
+            print("Журнал оценок недоступен, оценки будут получены по попыткам")
+            return {}, []
+
+        student_set = set(students)
+        attempts = {}
+        for user in grades_data['usergrades']:
+            user_id = user.get('userid')
+            if user_id not in student_set:
+                continue
+            for item in user.get('gradeitems', []):
+                quiz_id = item.get('iteminstance')
+                if item.get('itemmodule') != 'quiz' or quiz_id not in bulk_quizzes:
+                    continue
+                if item.get('graderaw') is None:
+                    continue
+                quiz = bulk_quizzes[quiz_id]
+                grade = round(float(item['graderaw']) * float(quiz['sumgrades']) / float(quiz['grade']), 5)
+                attempts[(user_id, quiz_id)] = [QuizAttempt(quiz_id, grade, grade)]
+
+        return attempts, list(bulk_quizzes)
+
+    def analyze_attempts_results(self, quiz_ids: List[int], group_id: int, course_id: int,
+                                 mode: str = 'sequential',
+                                 max_workers: Optional[int] = None,
+                                 incremental: bool = False,
+                                 strategy: str = 'attempts',
+                                 checkpoint: Optional[RunCheckpoint] = None) -> List[StudentResult]:
+        """
+        Анализирует все попытки по всем указанным тестам и возвращает максимальную оценку.
+        mode='threads' запрашивает попытки параллельно (не более max_workers запросов одновременно).
+        incremental=True берет попытки из локального хранилища, догружая только изменившиеся.
+        strategy='bulk' берет оценки из журнала оценок курса одним запросом; тесты, для которых
+        это невозможно, обрабатываются по попыткам.
+        checkpoint сохраняет попытки каждой пары по мере загрузки: прерванный запуск с теми же
+        параметрами продолжается, запрашивая только недостающие и неудачные пары
+        """
+        return self._analyze_group(quiz_ids, group_id, course_id, mode, max_workers,
+                                   incremental, strategy, checkpoint)[0]
+
+    def analyze_attempts_with_records(self, quiz_ids: List[int], group_id: int, course_id: int,
+                                      mode: str = 'sequential',
+                                      max_workers: Optional[int] = None,
+                                      incremental: bool = False,
+                                      strategy: str = 'attempts',
+                                      checkpoint: Optional[RunCheckpoint] = None
+                                      ) -> Tuple[List[StudentResult], List[AttemptRecord]]:
+        """
+        Результаты analyze_attempts_results и строки попыток для AttemptAnalytics
+        из одной загрузки попыток. При strategy='bulk' тесты из журнала оценок дают
+        одну строку с лучшей оценкой студента
+        """
+        results, students, student_names, attempts = self._analyze_group(
+            quiz_ids, group_id, course_id, mode, max_workers, incremental, strategy, checkpoint
+        )
+        records = self._attempt_records([group_id], {group_id: students}, quiz_ids, student_names, attempts)
+        return results, records
+
+    def _analyze_group(self, quiz_ids: List[int], group_id: int, course_id: int, mode: str,
+                       max_workers: Optional[int], incremental: bool, strategy: str,
+                       checkpoint: Optional[RunCheckpoint]) -> Tuple[List[StudentResult], List[int], Dict, Dict]:
+        """
+        Результаты зачета группы вместе с исходными данными: студенты, их имена и попытки
+        """
+        if strategy not in GRADE_STRATEGIES:
+            raise ValueError(f"Неизвестная стратегия: {strategy}. Допустимые: {', '.join(GRADE_STRATEGIES)}")
+        if checkpoint is not None and incremental:
+            raise ValueError("checkpoint не используется вместе с incremental: попытки уже хранятся в store")
+
+        phase = self.instrumentation.phase
+
+        with phase('analyze.group_lookup'):
+            students = self.get_group_students(group_id)
+        if not students:
+            return [], [], {}, {}
+
+        with phase('analyze.name_lookup'):
+            student_names = self.get_student_names(students)
+
+        with phase('analyze.attempt_fetching'):
+            attempts = {}
+            if strategy == 'bulk':
+                bulk_attempts, bulk_quiz_ids = self._bulk_quiz_grades(students, quiz_ids, course_id, group_id)
+                attempts.update(bulk_attempts)
+                quiz_ids_left = [quiz_id for quiz_id in quiz_ids if quiz_id not in bulk_quiz_ids]
+            else:
+                quiz_ids_left = quiz_ids
+
+            pairs = [(user_id, quiz_id) for user_id in students for quiz_id in quiz_ids_left]
+            if incremental:
+                attempts.update(self.sync_attempts(pairs, course_id, group_id, mode=mode, max_workers=max_workers))
+            else:
+                if checkpoint is not None:
+                    checkpoint.start(report='analyze_attempts_results', quiz_ids=quiz_ids, group_id=group_id,
+                                     course_id=course_id, strategy=strategy)
+                attempts.update(self._collect_attempts(pairs, mode, max_workers, checkpoint))
+
+        with phase('analyze.aggregation'):
+            results = self._best_grades(students, quiz_ids, student_names, attempts)
+
+        if checkpoint is not None and not incremental:
+            if any(result.failed_quiz_ids for result in results):
+                print(f"Запуск {checkpoint.run_id} завершен с ошибками, повторный запуск догрузит их")
+            else:
+                checkpoint.finish()
+        return results, students, student_names, attempts
+
+    def get_attempt_records(self, quiz_ids: List[int], group_ids: List[int],
+                            mode: str = 'sequential',
+                            max_workers: Optional[int] = None) -> List[AttemptRecord]:
+        """
+        Все завершенные попытки студентов групп по тестам — по строке на попытку
+        (user_id, user_name, group_id, quiz_id, grade). Студент без попыток по тесту
+        дает строку с grade = None; пары, которые не удалось загрузить, пропускаются
+        """
+        members = self.get_groups_students(group_ids)
+        all_students = list(dict.fromkeys(
+            user_id for group_id in group_ids for user_id in members.get(group_id, [])
+        ))
+        if not all_students:
+            return []
+
+        student_names = self.get_student_names(all_students)
+        attempts = self._collect_attempts(
+            [(user_id, quiz_id) for user_id in all_students for quiz_id in quiz_ids],
+            mode, max_workers
+        )
+        return self._attempt_records(group_ids, members, quiz_ids, student_names, attempts)
+
+    @classmethod
+    def _attempt_records(cls, group_ids: List[int], members: Dict[int, List[int]], quiz_ids: List[int],
+                         student_names: Dict,
+                         attempts: Dict[Tuple[int, int], Optional[List[QuizAttempt]]]) -> List[AttemptRecord]:
+        """
+        Строки попыток для аналитики. Незагруженные пары (None) не считаются
+        студентами без попыток, иначе они занижали бы долю сдавших
+        """
+        records = []
+        skipped = 0
+        for group_id in group_ids:
+            for user_id in members.get(group_id, []):
+                clean_name = cls._clean_name(student_names.get(user_id, "Неизвестный"))
+                for quiz_id in quiz_ids:
+                    user_attempts = attempts.get((user_id, quiz_id), [])
+                    if user_attempts is None:
+                        skipped += 1
+                        continue
+                    if not user_attempts:
+                        records.append(AttemptRecord(user_id, clean_name, group_id, quiz_id, None))
+                    for attempt in user_attempts:
+                        records.append(AttemptRecord(user_id, clean_name, group_id, quiz_id, attempt.grade))
+
+        if skipped:
+            print(f"В статистику не вошли {skipped} незагруженных пар (студент, тест)")
+        return records
+
+    def analyze_groups_batch(self, jobs: List[Tuple[int, int, List[int]]],
+                             mode: str = 'sequential',
+                             max_workers: Optional[int] = None) -> List[Dict]:
+        """
+        Пакетный анализ зачетов для заданий (course_id, group_id, quiz_ids).
+        Состав групп, названия групп и имена студентов запрашиваются общими
+        вызовами с массивами id, а попытки каждой пары (студент, тест) — один раз,
+        даже если студент входит в несколько групп
+        """
+        if not jobs:
+            return []
+
+        group_ids = list(dict.fromkeys(group_id for _, group_id, _ in jobs))
+        members = self.get_groups_students(group_ids)
+        group_names = self.get_group_names(group_ids)
+
+        all_students = list(dict.fromkeys(
+            user_id for group_id in group_ids for user_id in members.get(group_id, [])
+        ))
+        student_names = self.get_student_names(all_students)
+
+        pairs = [
+            (user_id, quiz_id)
+            for _, group_id, quiz_ids in jobs
+            for user_id in members.get(group_id, [])
+            for quiz_id in quiz_ids
+        ]
+        attempts = self._collect_attempts(pairs, mode, max_workers)
+
+        reports = []
+        for course_id, group_id, quiz_ids in jobs:
+            students = members.get(group_id, [])
+            reports.append({
+                'course_id': course_id,
+                'group_id': group_id,
+                'group_name': group_names.get(group_id),
+                'quiz_ids': list(quiz_ids),
+                'results': self._best_grades(students, quiz_ids, student_names, attempts) if students else []
+            })
+
+        return reports
 
     def get_course_groups(self, course_id: int) -> List:
         """
@@ -346,16 +1181,22 @@ class MoodleClient:
         """
         Получает название группы по её ID
         """
+        found, name = self.memo.get(('group', group_id))
+        if found:
+            return name
         try:
             params = {"groupids[0]": group_id}
             response = self.call_api("core_group_get_groups", **params)
 
+            if isinstance(response, dict) and 'groups' in response:
+                response = response['groups']
+
             if isinstance(response, list) and len(response) > 0:
-                return response[0].get('name')
+                name = response[0].get('name')
+                self.memo.set(('group', group_id), name)
+                return name
 
             if isinstance(response, dict):
-                if 'groups' in response and len(response['groups']) > 0:
-                    return response['groups'][0].get('name')
                 if 'exception' in response:
                     print(f"Ошибка API: {response.get('message')}")
 
@@ -363,4 +1204,35 @@ class MoodleClient:
 
         except Exception as e:
             print(f"Ошибка при получении названия группы: {str(e)}")
-            return None
\ No newline at end of file
+            return None
+
+    def get_group_names(self, group_ids: List[int]) -> Dict[int, Optional[str]]:
+        """
+        Получает названия нескольких групп одним запросом (кроме уже известных клиенту)
+        """
+        if not group_ids:
+            return {}
+        names, missing = self.memo.get_many('group', dict.fromkeys(group_ids))
+        if not missing:
+            return names
+        try:
+            params = {f"groupids[{i}]": group_id for i, group_id in enumerate(missing)}
+            response = self.call_api("core_group_get_groups", **params)
+
+            if isinstance(response, dict):
+                if 'exception' in response:
+                    print(f"Ошибка API: {response.get('message')}")
+                    return names
+                response = response.get('groups', [])
+
+            if not isinstance(response, list):
+                return names
+
+            fetched = {group.get('id'): group.get('name') for group in response if isinstance(group, dict)}
+            self.memo.set_many('group', fetched)
+            names.update(fetched)
+            return names
+
+        except Exception as e:
+            print(f"Ошибка при получении названий групп: {str(e)}")
+            return {}
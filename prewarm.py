@@ -0,0 +1,180 @@
+"""
+Предварительный прогрев данных перед сессией зачетов.
+
+Для каждой цели (курс, группы, тесты) задается окно времени. Пока окно открыто,
+фоновый поток раз в interval секунд с низким приоритетом загружает состав групп,
+названия групп, имена студентов и каталог тестов в кэш клиента, а попытки
+и журнал оценок курса — в локальное хранилище (store). Отчеты в «горячее» время
+с incremental (--incremental, "incremental": true в задании) читают эти данные
+и догружают только изменившееся.
+
+Манифест (JSON):
+    {
+        "targets": [
+            {"course_id": 5, "group_ids": [1, 2], "quiz_ids": [3, 4],
+             "start": "2024-12-20 08:00", "end": "2024-12-25 18:00", "interval": 900,
+             "interim": true}
+        ]
+    }
+"""
+import json
+import threading
+import time
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from moodle_client import MoodleClient
+
+DATETIME_FORMATS = ('%Y-%m-%d %H:%M', '%Y-%m-%d')
+
+# Интервал обновления цели внутри окна по умолчанию, в секундах
+DEFAULT_INTERVAL = 900
+
+
+def parse_datetime(value: str) -> datetime:
+    for date_format in DATETIME_FORMATS:
+        try:
+            return datetime.strptime(value, date_format)
+        except ValueError:
+            continue
+    raise ValueError(f"Неверный формат даты: {value}. Ожидается ГГГГ-ММ-ДД или ГГГГ-ММ-ДД ЧЧ:ММ")
+
+
+@dataclass
+class PrewarmTarget:
+    """
+    Что прогревать и когда: окно [start, end], обновление раз в interval секунд
+    """
+    course_id: int
+    start: datetime
+    end: datetime
+    group_ids: List[int] = field(default_factory=list)
+    quiz_ids: List[int] = field(default_factory=list)
+    interval: float = DEFAULT_INTERVAL
+    interim: bool = False
+    last_run: Optional[float] = None
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'PrewarmTarget':
+        start, end = parse_datetime(data['start']), parse_datetime(data['end'])
+        if start > end:
+            raise ValueError(f"Курс {data['course_id']}: начало окна позже его конца")
+        return cls(
+            course_id=data['course_id'],
+            start=start,
+            end=end,
+            group_ids=list(data.get('group_ids', [])),
+            quiz_ids=list(data.get('quiz_ids', [])),
+            interval=data.get('interval', DEFAULT_INTERVAL),
+            interim=bool(data.get('interim', False)),
+        )
+
+    def is_due(self, now: datetime) -> bool:
+        if not self.start <= now <= self.end:
+            return False
+        return self.last_run is None or time.time() - self.last_run >= self.interval
+
+
+def load_prewarm_manifest(path: str) -> List[PrewarmTarget]:
+    with open(path, encoding='utf-8') as f:
+        manifest = json.load(f)
+    targets = manifest['targets'] if isinstance(manifest, dict) else manifest
+    return [PrewarmTarget.from_dict(target) for target in targets]
+
+
+class PrewarmScheduler:
+    """
+    Фоновый прогрев кэша клиента по расписанию целей
+    """
+
+    def __init__(self, client: MoodleClient, targets: List[PrewarmTarget], poll_interval: float = 30):
+        self.client = client
+        self.targets = targets
+        self.poll_interval = poll_interval
+        self.history: List[Dict] = []
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def warm(self, target: PrewarmTarget) -> Dict:
+        """
+        Прогревает одну цель. Все запросы идут с низким приоритетом планировщика клиента
+        """
+        client = self.client
+        started = time.perf_counter()
+        stats = {'course_id': target.course_id, 'students': 0, 'attempt_pairs': 0, 'grade_report': False}
+
+        with client.scheduler.background():
+            if target.quiz_ids:
+                client.get_course_quizzes(target.course_id)
+
+            # Запросы повторяют вызовы отчета зачета по группе, чтобы совпали ключи кэша
+            members = {}
+            for group_id in target.group_ids:
+                members[group_id] = client.get_group_students(group_id) or []
+                client.get_group_name(group_id)
+                client.get_student_names(members[group_id])
+            stats['students'] = len({user_id for students in members.values() for user_id in students})
+
+            if client.store is not None:
+                for group_id in target.group_ids:
+                    pairs = [(user_id, quiz_id) for user_id in members[group_id]
+                             for quiz_id in target.quiz_ids]
+                    if pairs:
+                        client.sync_attempts(pairs, target.course_id, group_id)
+                        stats['attempt_pairs'] += len(pairs)
+                if target.interim:
+                    stats['grade_report'] = client.sync_grade_report(target.course_id)
+            elif target.quiz_ids or target.interim:
+                print("Попытки и журнал оценок прогреваются только при заданном локальном хранилище (store)")
+
+        target.last_run = time.time()
+        stats['elapsed'] = time.perf_counter() - started
+        self.history.append(stats)
+        return stats
+
+    def run_pending(self, now: Optional[datetime] = None) -> List[Dict]:
+        """
+        Прогревает цели, окно которых открыто и срок обновления наступил
+        """
+        now = now or datetime.now()
+        results = []
+        for target in self.targets:
+            if self._stop.is_set():
+                break
+            if not target.is_due(now):
+                continue
+            try:
+                stats = self.warm(target)
+                print(f"Прогрев курса {target.course_id}: студентов {stats['students']}, "
+                      f"пар попыток {stats['attempt_pairs']}, {stats['elapsed']:.1f} с")
+                results.append(stats)
+            except Exception as e:
+                target.last_run = time.time()
+                print(f"Ошибка прогрева курса {target.course_id}: {e}")
+        return results
+
+    def finished(self, now: Optional[datetime] = None) -> bool:
+        now = now or datetime.now()
+        return all(target.end < now for target in self.targets)
+
+    def run_forever(self) -> None:
+        """
+        Прогревает цели до закрытия всех окон или до stop()
+        """
+        while not self._stop.is_set() and not self.finished():
+            self.run_pending()
+            self._stop.wait(self.poll_interval)
+
+    def start(self) -> 'PrewarmScheduler':
+        """
+        Запускает прогрев в фоновом потоке
+        """
+        self._thread = threading.Thread(target=self.run_forever, name='prewarm', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self, timeout: Optional[float] = None) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
@@ -0,0 +1,164 @@
+"""
+Компактные записи отчетов вместо словарей: dataclass со __slots__ не хранит
+__dict__ у каждого экземпляра, а повторяющиеся строки (ФИО, названия элементов
+и курсов) интернируются и хранятся в памяти один раз.
+
+Для кода, работающего со словарями, записи поддерживают record['поле'],
+record.get('поле') и to_dict().
+"""
+import sys
+from dataclasses import dataclass, fields, asdict
+from typing import Any, Dict, List, Optional, Iterator, Iterable, Sequence, Tuple
+
+
+def intern_str(value: Any) -> Any:
+    """
+    Интернирует строку, остальные значения возвращает как есть
+    """
+    return sys.intern(value) if type(value) is str else value
+
+
+class DictCompat:
+    """
+    Доступ к полям записи как к ключам словаря
+    """
+    __slots__ = ()
+
+    def __getitem__(self, key: str) -> Any:
+        if key not in self.__slots__:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def get(self, key: str, default: Any = None) -> Any:
+        return getattr(self, key) if key in self.__slots__ else default
+
+    def __contains__(self, key: str) -> bool:
+        return key in self.__slots__
+
+    def keys(self) -> List[str]:
+        return [field.name for field in fields(self)]
+
+    def items(self) -> Iterator:
+        return ((name, getattr(self, name)) for name in self.keys())
+
+    def to_dict(self) -> Dict:
+        return asdict(self)
+
+
+@dataclass(slots=True)
+class QuizAttempt(DictCompat):
+    """
+    Завершенная попытка (или лучшая оценка из журнала) студента по тесту
+    """
+    quiz_id: int
+    raw_grade: Optional[float]
+    grade: float
+
+
+@dataclass(slots=True)
+class StudentResult(DictCompat):
+    """
+    Лучшая оценка студента по тестам зачета. best_grade = None, если ни один
+    тест не загрузился; failed_quiz_ids — тесты, попытки по которым получить не удалось
+    """
+    user_name: str
+    best_grade: Optional[float]
+    failed_quiz_ids: Tuple[int, ...] = ()
+
+    def __post_init__(self):
+        self.user_name = intern_str(self.user_name)
+
+
+@dataclass(slots=True)
+class AttemptRecord(DictCompat):
+    """
+    Строка попытки для аналитики: студент, группа, тест, оценка
+    """
+    user_id: int
+    user_name: str
+    group_id: int
+    quiz_id: int
+    grade: Optional[float]
+
+    def __post_init__(self):
+        self.user_name = intern_str(self.user_name)
+
+
+@dataclass(slots=True)
+class GradeEntry(DictCompat):
+    """
+    Оценка студента по элементу оценивания в отчете промежуточной аттестации
+    """
+    item_id: int
+    item: str
+    grade: Any
+    percentage: Any
+    raw_grade: Optional[float] = None
+
+    def __post_init__(self):
+        self.item = intern_str(self.item)
+
+
+@dataclass(slots=True)
+class StudentGrades(DictCompat):
+    """
+    Оценки одного студента в отчете промежуточной аттестации
+    """
+    userid: int
+    userfullname: str
+    grades: List[GradeEntry]
+
+    def __post_init__(self):
+        self.userfullname = intern_str(self.userfullname)
+
+
+@dataclass(slots=True)
+class Course(DictCompat):
+    """
+    Курс в отчете курсов преподавателя. enddate — дата или «Не указана»
+    """
+    id: int
+    fullname: str
+    startdate: str
+    enddate: str
+
+    def __post_init__(self):
+        self.fullname = intern_str(self.fullname)
+        self.startdate = intern_str(self.startdate)
+        self.enddate = intern_str(self.enddate)
+
+
+def json_default(value: Any) -> Any:
+    """
+    Для json.dumps(..., default=json_default): записи сериализуются как словари
+    """
+    if isinstance(value, DictCompat):
+        return value.to_dict()
+    return str(value)
+
+
+def to_columns(records: Iterable[Any], columns: Sequence[str]) -> Dict[str, List]:
+    """
+    Колонки {поле: значения} из записей или словарей — для DataFrame без промежуточных dict
+    """
+    data = {column: [] for column in columns}
+    appends = [(column, data[column].append) for column in columns]
+    for record in records:
+        for column, append in appends:
+            append(record[column])
+    return data
+
+
+def failed_quizzes_text(result: Any) -> str:
+    """
+    Тесты результата зачета, попытки по которым не загрузились, через запятую
+    (пустая строка, если загрузились все)
+    """
+    return ', '.join(str(quiz_id) for quiz_id in result.get('failed_quiz_ids') or ())
+
+
+def to_dicts(records: List[Any]) -> List[Dict]:
+    """
+    Список записей в виде словарей для кода, которому нужны именно dict
+    """
+    return [record.to_dict() if isinstance(record, DictCompat) else record for record in records]
@@ -0,0 +1,34 @@
+"""
+Форматы файлов отчетов. Модуль не зависит от openpyxl и pandas, поэтому формат
+можно проверить до загрузки данных и импорта тяжелых библиотек.
+"""
+import os
+from typing import Optional
+
+REPORT_FORMATS = ('xlsx', 'csv', 'parquet', 'arrow')
+
+FORMAT_EXTENSIONS = {
+    '.csv': 'csv',
+    '.parquet': 'parquet',
+    '.arrow': 'arrow',
+    '.feather': 'arrow',
+    '.xlsx': 'xlsx',
+}
+
+
+def detect_format(filename: str) -> str:
+    extension = os.path.splitext(filename)[1].lower()
+    if extension not in FORMAT_EXTENSIONS:
+        raise ValueError(f"Не удалось определить формат по расширению файла: {filename}")
+    return FORMAT_EXTENSIONS[extension]
+
+
+def resolve_format(filename: str, file_format: Optional[str] = None) -> str:
+    """
+    Формат отчета: явно заданный или по расширению файла
+    """
+    if file_format is None:
+        return detect_format(filename)
+    if file_format not in REPORT_FORMATS:
+        raise ValueError(f"Неизвестный формат: {file_format}. Допустимые: {', '.join(REPORT_FORMATS)}")
+    return file_format
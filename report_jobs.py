@@ -0,0 +1,261 @@
+"""
+Пакетное формирование отчетов по манифесту.
+
+Загрузка данных из API идет параллельно в потоках, сборка книг Excel — в пуле
+процессов, файлы записываются атомарно. Ошибка одного задания не останавливает пакет.
+
+Манифест (JSON):
+    {
+        "jobs": [
+            {"type": "zachet", "course_id": 5, "group_id": 1, "quiz_ids": [3], "output": "out/zachet_1.xlsx",
+             "checkpoint": "out/runs.sqlite3", "stats": true, "pass_grade": 6},
+            {"type": "interim", "course_id": 5, "start": "2024-09-01", "end": "2024-12-31", "output": "out/interim_5.xlsx",
+             "incremental": true},
+            {"type": "courses", "teacher_email": "teacher@example.com", "start": "2024-09-01", "end": "2024-12-31",
+             "output": "out/courses.xlsx"},
+            {"type": "courses", "teacher_emails": ["a@example.com", "b@example.com"], "start": "2024-09-01",
+             "end": "2024-12-31", "output": "out/department.xlsx"}
+        ]
+    }
+
+Формат отчета определяется расширением output (.xlsx, .csv, .parquet, .arrow) или ключом format.
+
+Запуск (--cache, --store, --workers и --rate — как в main.py; задания с incremental
+читают данные из --store, например прогретого командой prewarm):
+    python report_jobs.py manifest.json --fetch-workers 4 --build-workers 4
+    python report_jobs.py manifest.json --cache cache.sqlite3 --store store.sqlite3
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import tempfile
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, ProcessPoolExecutor, wait
+from typing import Dict, List, Optional, Tuple, Any
+
+from moodle_client import MoodleClient
+from run_checkpoint import RunCheckpoint
+from report_formats import resolve_format
+
+JOB_TYPES = ('zachet', 'interim', 'courses')
+
+
+def load_manifest(path: str) -> List[Dict]:
+    with open(path, encoding='utf-8') as f:
+        manifest = json.load(f)
+    jobs = manifest['jobs'] if isinstance(manifest, dict) else manifest
+    for index, job in enumerate(jobs):
+        if job.get('type') not in JOB_TYPES:
+            raise ValueError(f"Задание {index}: неизвестный тип {job.get('type')}")
+        if not job.get('output'):
+            raise ValueError(f"Задание {index}: не указан output")
+        try:
+            resolve_format(job['output'], job.get('format'))
+        except ValueError as e:
+            raise ValueError(f"Задание {index}: {e}")
+    return jobs
+
+
+def job_name(job: Dict) -> str:
+    return job.get('name') or os.path.basename(job['output'])
+
+
+def fetch_job(client: MoodleClient, job: Dict) -> Tuple[Any, Dict]:
+    """
+    Загружает данные задания. Возвращает данные отчета и параметры export_report:
+    название группы (для зачета), а при "stats" — статистику попыток и порог сдачи
+    """
+    job_type = job['type']
+
+    # incremental: данные берутся из локального хранилища клиента (например, прогретого prewarm)
+    incremental = bool(job.get('incremental', False))
+    if incremental and client.store is None:
+        raise ValueError("Для incremental нужно локальное хранилище (store)")
+
+    if job_type == 'zachet':
+        checkpoint = RunCheckpoint(job['checkpoint']) if job.get('checkpoint') else None
+        # Статистика строится из тех же попыток, что и оценки, без повторных запросов
+        analyze = client.analyze_attempts_with_records if job.get('stats') else client.analyze_attempts_results
+        try:
+            result = analyze(
+                job['quiz_ids'], job['group_id'], job['course_id'],
+                mode=job.get('mode', 'sequential'),
+                strategy=job.get('strategy', 'attempts'),
+                incremental=incremental,
+                checkpoint=checkpoint
+            )
+        finally:
+            if checkpoint is not None:
+                checkpoint.close()
+        group_name = job.get('group_name') or client.get_group_name(job['group_id']) or ''
+        options = {'group_name': group_name}
+        if not job.get('stats'):
+            return result, options
+
+        from attempt_analytics import AttemptAnalytics
+
+        data, records = result
+        options['analytics'] = AttemptAnalytics.from_records(records, {job['group_id']: group_name})
+        options['pass_grade'] = job.get('pass_grade')
+        return data, options
+
+    if job_type == 'interim':
+        return client.track_interim_assessment(job['course_id'], job['start'], job['end'],
+                                               incremental=incremental), {}
+
+    if job.get('teacher_ids') or job.get('teacher_emails'):
+        # Отчет по кафедре: курсы нескольких преподавателей одним списком
+        teacher_ids = list(job.get('teacher_ids') or [])
+        if job.get('teacher_emails'):
+            found = client.get_user_ids_by_emails(job['teacher_emails'])
+            teacher_ids.extend(user_id for user_id in found.values() if user_id is not None)
+        if not teacher_ids:
+            raise ValueError("Преподаватели не найдены")
+        index = client.build_course_index(teacher_ids)
+        courses = index.courses_in_range(job['start'], job['end'], teacher_ids)
+        return (courses, len(courses)), {}
+
+    teacher_id = job.get('teacher_id') or client.get_user_id_by_username(job['teacher_email'])
+    if teacher_id is None:
+        raise ValueError(f"Преподаватель {job.get('teacher_email')} не найден")
+    return client.get_teacher_courses(teacher_id, job['start'], job['end']), {}
+
+
+def build_job(data: Any, output: str, options: Optional[Dict] = None,
+              file_format: Optional[str] = None) -> float:
+    """
+    Собирает отчет во временный файл рядом с output и атомарно заменяет им output.
+    Формат берется из file_format или из расширения output (как в export_report),
+    options — параметры экспорта из fetch_job. Выполняется в отдельном процессе,
+    возвращает время сборки
+    """
+    from exporters import export_report
+
+    started = time.perf_counter()
+    file_format = resolve_format(output, file_format)
+    directory = os.path.dirname(os.path.abspath(output))
+    os.makedirs(directory, exist_ok=True)
+    output_stem, extension = os.path.splitext(output)
+    fd, tmp_path = tempfile.mkstemp(prefix=f".{os.path.basename(output_stem)}.", suffix=f".tmp{extension}",
+                                    dir=directory)
+    os.close(fd)
+    os.remove(tmp_path)
+    tmp_stem = os.path.splitext(tmp_path)[0]
+
+    written = []
+    try:
+        written = export_report(data, tmp_path, file_format, **(options or {}))
+        if tmp_path not in written:
+            raise RuntimeError("Экспорт не создал файл (нет данных или ошибка экспорта)")
+
+        # Дополнительные таблицы колоночных форматов (<имя>.<таблица><расширение>) переносятся
+        # вместе с основным файлом, основной — последним
+        for path in written:
+            if path != tmp_path:
+                os.replace(path, output_stem + path[len(tmp_stem):])
+        os.replace(tmp_path, output)
+    finally:
+        for path in written + [tmp_path]:
+            if os.path.exists(path):
+                os.remove(path)
+
+    return time.perf_counter() - started
+
+
+def run_jobs(client: MoodleClient, jobs: List[Dict], fetch_workers: int = 4,
+             build_workers: Optional[int] = None) -> List[Dict]:
+    """
+    Выполняет задания конвейером: загрузка в потоках -> сборка в процессах.
+    Возвращает результат по каждому заданию: статус, ошибку и время этапов
+    """
+    results = [
+        {'name': job_name(job), 'output': job['output'], 'status': 'pending',
+         'fetch_time': None, 'build_time': None, 'error': None}
+        for job in jobs
+    ]
+    total = len(jobs)
+    done = 0
+
+    def timed_fetch(job: Dict) -> Tuple[Any, Dict, float]:
+        started = time.perf_counter()
+        data, options = fetch_job(client, job)
+        return data, options, time.perf_counter() - started
+
+    def report(index: int) -> None:
+        nonlocal done
+        done += 1
+        result = results[index]
+        timing = ', '.join(
+            f"{label} {result[key]:.2f} с" for label, key in (('загрузка', 'fetch_time'), ('сборка', 'build_time'))
+            if result[key] is not None
+        )
+        status = 'готово' if result['status'] == 'ok' else f"ошибка: {result['error']}"
+        print(f"[{done}/{total}] {result['name']}: {status}" + (f" ({timing})" if timing else ''))
+
+    # Процессы сборки запускаются через spawn: fork во время работы потоков загрузки
+    # скопировал бы захваченные ими блокировки (метрики, print, SQLite) и мог зависнуть
+    with ThreadPoolExecutor(max_workers=fetch_workers) as fetch_pool, \
+            ProcessPoolExecutor(max_workers=build_workers,
+                                mp_context=multiprocessing.get_context('spawn')) as build_pool:
+        # Загрузки и сборки ждутся вместе: сборка отчитывается сразу по завершении,
+        # не дожидаясь окончания всех загрузок
+        fetch_futures = {fetch_pool.submit(timed_fetch, job): index for index, job in enumerate(jobs)}
+        build_futures = {}
+        pending = set(fetch_futures)
+
+        while pending:
+            finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in finished:
+                if future in fetch_futures:
+                    index = fetch_futures[future]
+                    job = jobs[index]
+                    try:
+                        data, options, fetch_time = future.result()
+                        results[index]['fetch_time'] = fetch_time
+                        build_future = build_pool.submit(build_job, data, job['output'], options, job.get('format'))
+                        build_futures[build_future] = index
+                        pending.add(build_future)
+                    except Exception as e:
+                        results[index].update(status='failed', error=f"загрузка: {e}")
+                        report(index)
+                else:
+                    index = build_futures[future]
+                    try:
+                        results[index]['build_time'] = future.result()
+                        results[index]['status'] = 'ok'
+                    except Exception as e:
+                        results[index].update(status='failed', error=f"сборка: {e}")
+                    report(index)
+
+    return results
+
+
+def main() -> int:
+    from main import add_client_options, make_client
+
+    parser = argparse.ArgumentParser(description="Пакетное формирование отчетов по манифесту")
+    parser.add_argument('manifest', help="JSON-файл с заданиями")
+    parser.add_argument('--fetch-workers', type=int, default=4, help="Потоков загрузки данных")
+    parser.add_argument('--build-workers', type=int, default=None, help="Процессов сборки книг (по умолчанию — по числу ядер)")
+    add_client_options(parser)
+    args = parser.parse_args()
+
+    jobs = load_manifest(args.manifest)
+    for index, job in enumerate(jobs):
+        if job.get('incremental') and not args.store:
+            print(f"Задание {index}: для incremental нужен --store")
+            return 2
+    started = time.perf_counter()
+    results = run_jobs(make_client(args), jobs, args.fetch_workers, args.build_workers)
+
+    failed = [r for r in results if r['status'] != 'ok']
+    print(f"\nГотово: {len(results) - len(failed)} из {len(results)} за {time.perf_counter() - started:.2f} с")
+    for result in failed:
+        print(f"  {result['name']}: {result['error']}")
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,170 @@
+"""
+Долгоживущий HTTP-сервис отчетов с «теплым» MoodleClient: пул соединений,
+кэш метаданных в памяти и импортированные библиотеки переиспользуются между запросами.
+
+Запросы:
+    GET  /health                  — проверка работы
+    GET  /metrics                 — счетчики вызовов API и фаз отчетов, параллельность и темп запросов
+    POST /reports/<type>          — отчет zachet | interim | courses, тело — JSON задания
+                                    (как в манифесте report_jobs, без output и checkpoint) и format;
+                                    "incremental": true читает данные из store клиента
+    POST /cache/invalidate        — сброс кэша и метаданных в памяти, тело {"function": ...} (необязательно)
+
+Пример:
+    curl -X POST localhost:8765/reports/zachet -o zachet.xlsx \\
+         -d '{"course_id": 5, "group_id": 1, "quiz_ids": [3], "format": "xlsx"}'
+"""
+import json
+import os
+import tempfile
+import time
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from typing import Dict, Tuple
+
+from moodle_client import MoodleClient
+from report_jobs import JOB_TYPES, fetch_job
+from exporters import export_report
+from records import json_default
+
+CONTENT_TYPES = {
+    'xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+    'csv': 'text/csv; charset=utf-8',
+    'parquet': 'application/vnd.apache.parquet',
+    'arrow': 'application/vnd.apache.arrow.file',
+}
+
+# Параметры задания, которые принимает сервис. Пути к файлам на сервере (output, checkpoint)
+# запросом не задаются
+SERVICE_JOB_KEYS = frozenset({
+    'format', 'course_id', 'group_id', 'group_name', 'quiz_ids', 'mode', 'strategy',
+    'incremental', 'stats', 'pass_grade', 'start', 'end',
+    'teacher_id', 'teacher_email', 'teacher_ids', 'teacher_emails',
+})
+
+
+class ReportService:
+    """
+    Формирование отчетов по запросу на одном общем клиенте
+    """
+
+    def __init__(self, client: MoodleClient):
+        self.client = client
+        self.started_at = time.time()
+
+    def generate(self, job_type: str, job: Dict) -> Tuple[bytes, str, str]:
+        """
+        Возвращает содержимое файла отчета, его MIME-тип и имя файла
+        """
+        if job_type not in JOB_TYPES:
+            raise ValueError(f"Неизвестный тип отчета: {job_type}")
+        unknown = sorted(set(job) - SERVICE_JOB_KEYS)
+        if unknown:
+            raise ValueError(f"Недопустимые параметры задания: {', '.join(unknown)}")
+        file_format = job.get('format', 'xlsx')
+        if file_format not in CONTENT_TYPES:
+            raise ValueError(f"Неизвестный формат: {file_format}")
+
+        data, options = fetch_job(self.client, dict(job, type=job_type))
+        if not data:
+            raise LookupError("Нет данных для отчета")
+
+        with tempfile.TemporaryDirectory() as workdir:
+            filename = f"{job_type}.{file_format}"
+            path = os.path.join(workdir, filename)
+            export_report(data, path, file_format, **options)
+            if not os.path.exists(path):
+                raise RuntimeError("Не удалось сформировать файл отчета")
+            with open(path, 'rb') as f:
+                return f.read(), CONTENT_TYPES[file_format], filename
+
+
+def make_handler(service: ReportService):
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def _send(self, status: int, body: bytes, content_type: str, headers: Dict = None) -> None:
+            self.send_response(status)
+            self.send_header('Content-Type', content_type)
+            self.send_header('Content-Length', str(len(body)))
+            for key, value in (headers or {}).items():
+                self.send_header(key, value)
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _send_json(self, status: int, payload) -> None:
+            body = json.dumps(payload, ensure_ascii=False, default=json_default).encode('utf-8')
+            self._send(status, body, 'application/json; charset=utf-8')
+
+        def _read_json(self) -> Dict:
+            length = int(self.headers.get('Content-Length', 0))
+            if not length:
+                return {}
+            return json.loads(self.rfile.read(length).decode('utf-8'))
+
+        def do_GET(self):
+            if self.path == '/health':
+                self._send_json(200, {'status': 'ok', 'uptime': time.time() - service.started_at})
+            elif self.path == '/metrics':
+                self._send_json(200, dict(service.client.instrumentation.snapshot(),
+                                          memo=service.client.memo.stats(),
+                                          scheduler=service.client.scheduler.snapshot()))
+            else:
+                self._send_json(404, {'error': 'Не найдено'})
+
+        def do_POST(self):
+            try:
+                payload = self._read_json()
+            except ValueError as e:
+                self._send_json(400, {'error': f"Некорректный JSON: {e}"})
+                return
+
+            if self.path == '/cache/invalidate':
+                cache = service.client.cache
+                removed = cache.invalidate(payload.get('function')) if cache is not None else 0
+                memo_removed = service.client.invalidate_memo(payload.get('function'))
+                self._send_json(200, {'removed': removed, 'memo_removed': memo_removed})
+                return
+
+            if not self.path.startswith('/reports/'):
+                self._send_json(404, {'error': 'Не найдено'})
+                return
+
+            job_type = self.path[len('/reports/'):]
+            started = time.perf_counter()
+            try:
+                body, content_type, filename = service.generate(job_type, payload)
+            except KeyError as e:
+                self._send_json(400, {'error': f"Не указан параметр {e}"})
+                return
+            except ValueError as e:
+                self._send_json(400, {'error': str(e)})
+                return
+            except LookupError as e:
+                self._send_json(404, {'error': str(e)})
+                return
+            except Exception as e:
+                self._send_json(500, {'error': str(e)})
+                return
+
+            self._send(200, body, content_type, {
+                'Content-Disposition': f'attachment; filename="{filename}"',
+                'X-Report-Time': f"{time.perf_counter() - started:.3f}",
+            })
+
+        def log_message(self, format, *args):
+            print(f"[{self.log_date_time_string()}] {self.address_string()} {format % args}")
+
+    return Handler
+
+
+def serve(client: MoodleClient, host: str = '127.0.0.1', port: int = 8765) -> None:
+    server = ThreadingHTTPServer((host, port), make_handler(ReportService(client)))
+    server.daemon_threads = True
+    print(f"Сервис отчетов запущен: http://{host}:{server.server_address[1]}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
@@ -0,0 +1,240 @@
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Deque, Dict, Iterator, Optional, Tuple
+
+# Окно для текущего темпа запросов и доли ошибок, в секундах / запросах
+RATE_WINDOW = 10.0
+ERROR_WINDOW = 100
+
+# Коэффициент сглаживания задержки (EWMA)
+LATENCY_ALPHA = 0.2
+
+
+class TokenBucket:
+    """
+    Ограничение темпа запросов: не более rate запросов в секунду
+    с допустимым всплеском burst
+    """
+
+    def __init__(self, rate: float, burst: Optional[float] = None):
+        if rate <= 0:
+            raise ValueError("Темп запросов должен быть положительным")
+        self.rate = rate
+        self.capacity = burst or max(1.0, rate)
+        self.tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> float:
+        """
+        Ждет свободный токен. Возвращает время ожидания в секундах
+        """
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return waited
+                delay = (1 - self.tokens) / self.rate
+            time.sleep(delay)
+            waited += delay
+
+
+class FunctionLoad:
+    """
+    Скользящие показатели одной функции API: сглаженная задержка,
+    ее лучший уровень и доля ошибок среди последних запросов
+    """
+
+    def __init__(self):
+        self.requests = 0
+        self.latency: Optional[float] = None
+        self.baseline: Optional[float] = None
+        self.outcomes: Deque[bool] = deque(maxlen=ERROR_WINDOW)
+
+    def record(self, elapsed: float, error: bool) -> None:
+        self.requests += 1
+        self.outcomes.append(error)
+        if error:
+            return
+        self.latency = elapsed if self.latency is None else \
+            LATENCY_ALPHA * elapsed + (1 - LATENCY_ALPHA) * self.latency
+        # Базовый уровень фиксируется после нескольких запросов, чтобы не зависеть от первого
+        if self.requests >= 5 and (self.baseline is None or self.latency < self.baseline):
+            self.baseline = self.latency
+
+    @property
+    def error_rate(self) -> float:
+        return sum(self.outcomes) / len(self.outcomes) if self.outcomes else 0.0
+
+    def as_dict(self) -> Dict:
+        return {
+            'requests': self.requests,
+            'latency': self.latency,
+            'baseline': self.baseline,
+            'error_rate': self.error_rate,
+        }
+
+
+class RequestScheduler:
+    """
+    Адаптивный планировщик запросов к Moodle (AIMD): предел одновременных
+    запросов растет на 1 за каждые limit успешных ответов и уменьшается вдвое
+    при ошибках перегрузки или росте задержки функции выше latency_factor × ее
+    базового уровня. rate_limit дополнительно ограничивает число запросов в секунду.
+    Запросы фоновых потоков (background) получают не больше background_share предела
+    и ждут, пока есть ожидающие основные запросы
+    """
+
+    def __init__(self, max_concurrency: int = 8, min_concurrency: int = 1,
+                 rate_limit: Optional[float] = None, latency_factor: float = 3.0,
+                 decrease_factor: float = 0.5, cooldown: float = 1.0,
+                 initial_concurrency: Optional[int] = None, background_share: float = 0.25):
+        if min_concurrency < 1 or max_concurrency < min_concurrency:
+            raise ValueError("Неверные границы параллельности")
+        self.max_concurrency = max_concurrency
+        self.min_concurrency = min_concurrency
+        self.latency_factor = latency_factor
+        self.decrease_factor = decrease_factor
+        self.cooldown = cooldown
+        # Начинаем с малой параллельности, чтобы базовая задержка функций
+        # измерялась до того, как сервер окажется под полной нагрузкой
+        self.limit = float(initial_concurrency or max(min_concurrency, max_concurrency // 4))
+        self.background_share = background_share
+        self.in_flight = 0
+        self.background_in_flight = 0
+        self.waiting = 0
+        self.decreases = 0
+        self.throttled_time = 0.0
+        self.bucket = TokenBucket(rate_limit) if rate_limit else None
+        self.functions: Dict[str, FunctionLoad] = {}
+        self._completed: Deque[float] = deque()
+        self._last_decrease = 0.0
+        self._cond = threading.Condition()
+        self._local = threading.local()
+
+    @property
+    def rate_limit(self) -> Optional[float]:
+        return self.bucket.rate if self.bucket else None
+
+    def set_rate_limit(self, rate_limit: Optional[float]) -> None:
+        self.bucket = TokenBucket(rate_limit) if rate_limit else None
+
+    @contextmanager
+    def background(self) -> Iterator[None]:
+        """
+        Запросы текущего потока внутри блока выполняются с низким приоритетом
+        """
+        previous = getattr(self._local, 'background', False)
+        self._local.background = True
+        try:
+            yield
+        finally:
+            self._local.background = previous
+
+    def _has_room(self, background: bool) -> bool:
+        limit = max(self.min_concurrency, int(self.limit))
+        if not background:
+            return self.in_flight < limit
+        background_limit = max(1, int(limit * self.background_share))
+        return not self.waiting and self.in_flight < limit \
+            and self.background_in_flight < background_limit
+
+    def acquire(self, function: str) -> Tuple[float, bool]:
+        """
+        Ждет свободное место в пределе параллельности и токен темпа.
+        Возвращает отметку запроса для release: момент начала и признак фонового запроса
+        """
+        background = getattr(self._local, 'background', False)
+        with self._cond:
+            if not background:
+                self.waiting += 1
+            try:
+                while not self._has_room(background):
+                    self._cond.wait()
+            finally:
+                if not background:
+                    self.waiting -= 1
+            self.in_flight += 1
+            if background:
+                self.background_in_flight += 1
+
+        bucket = self.bucket
+        if bucket is not None:
+            waited = bucket.acquire()
+            if waited:
+                with self._cond:
+                    self.throttled_time += waited
+        return time.perf_counter(), background
+
+    def release(self, function: str, slot: Tuple[float, bool], error: Optional[str] = None,
+                overloaded: bool = False) -> None:
+        """
+        Учитывает результат запроса. overloaded — ошибка, вызванная нагрузкой на сервер
+        (сбой соединения, тайм-аут, 5xx, 429); ошибки Moodle из-за параметров ее не означают
+        """
+        started, background = slot
+        elapsed = time.perf_counter() - started
+        with self._cond:
+            self.in_flight -= 1
+            if background:
+                self.background_in_flight -= 1
+            load = self.functions.get(function)
+            if load is None:
+                load = self.functions[function] = FunctionLoad()
+            load.record(elapsed, bool(error))
+
+            now = time.monotonic()
+            self._completed.append(now)
+            while self._completed and self._completed[0] < now - RATE_WINDOW:
+                self._completed.popleft()
+
+            slow = load.baseline is not None and load.latency > load.baseline * self.latency_factor
+            if overloaded or slow:
+                if now - self._last_decrease >= self.cooldown:
+                    self.limit = max(float(self.min_concurrency), self.limit * self.decrease_factor)
+                    self._last_decrease = now
+                    self.decreases += 1
+                    if slow:
+                        # Новый уровень задержки после снижения нагрузки становится отправной точкой
+                        load.baseline = load.latency
+            elif not error:
+                self.limit = min(float(self.max_concurrency), self.limit + 1 / max(self.limit, 1.0))
+            self._cond.notify_all()
+
+    def current_rate(self) -> float:
+        """
+        Фактический темп запросов за последние RATE_WINDOW секунд
+        """
+        with self._cond:
+            now = time.monotonic()
+            recent = sum(1 for completed in self._completed if completed >= now - RATE_WINDOW)
+        return recent / RATE_WINDOW
+
+    def snapshot(self) -> Dict:
+        rate = self.current_rate()
+        with self._cond:
+            return {
+                'concurrency_limit': self.limit,
+                'in_flight': self.in_flight,
+                'background_in_flight': self.background_in_flight,
+                'max_concurrency': self.max_concurrency,
+                'rate_limit': self.rate_limit,
+                'current_rate': rate,
+                'decreases': self.decreases,
+                'throttled_time': self.throttled_time,
+                'functions': {name: load.as_dict() for name, load in self.functions.items()},
+            }
+
+
+def format_scheduler(snapshot: Dict) -> str:
+    rate_limit = snapshot['rate_limit']
+    return (f"Параллельность: {snapshot['concurrency_limit']:.1f} из {snapshot['max_concurrency']} "
+            f"(снижений: {snapshot['decreases']}), темп: {snapshot['current_rate']:.1f} запр/с"
+            + (f" при лимите {rate_limit:g}" if rate_limit else '')
+            + (f", ожидание лимита: {snapshot['throttled_time']:.2f} с" if snapshot['throttled_time'] else ''))
@@ -0,0 +1,160 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+from records import QuizAttempt
+
+STATUS_OK = 'ok'
+STATUS_FAILED = 'failed'
+
+
+class RunCheckpoint:
+    """
+    Контрольные точки долгого запуска отчета на SQLite: результат каждой пары
+    (студент, тест) сохраняется сразу после загрузки. Повторный запуск с тем же
+    run_id берет готовые пары из файла и запрашивает только недостающие и неудачные
+    """
+
+    def __init__(self, path: str = 'moodle_runs.sqlite3', run_id: Optional[str] = None):
+        self.path = path
+        self.run_id = run_id
+        self._fixed_run_id = run_id is not None
+        self._lock = threading.Lock()
+        # Файл обычно лежит рядом с отчетами, каталог которых еще может не существовать
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.executescript("""
+            PRAGMA journal_mode = WAL;
+            PRAGMA synchronous = NORMAL;
+            CREATE TABLE IF NOT EXISTS runs (
+                run_id TEXT PRIMARY KEY,
+                params TEXT NOT NULL,
+                started_at REAL NOT NULL,
+                finished_at REAL
+            );
+            CREATE TABLE IF NOT EXISTS run_pairs (
+                run_id TEXT NOT NULL,
+                userid INTEGER NOT NULL,
+                quizid INTEGER NOT NULL,
+                status TEXT NOT NULL,
+                payload TEXT,
+                error TEXT,
+                updated_at REAL NOT NULL,
+                PRIMARY KEY (run_id, userid, quizid)
+            );
+        """)
+        self._conn.commit()
+
+    @staticmethod
+    def make_run_id(**params) -> str:
+        """
+        Идентификатор запуска по его параметрам: одинаковые запуски продолжают друг друга
+        """
+        raw = json.dumps(params, sort_keys=True, default=str)
+        return hashlib.sha256(raw.encode('utf-8')).hexdigest()[:16]
+
+    def start(self, **params) -> str:
+        """
+        Регистрирует запуск или продолжает незавершенный. Завершенный запуск
+        с тем же run_id начинается заново. Если run_id не задан, он вычисляется по параметрам
+        """
+        if not self._fixed_run_id:
+            self.run_id = self.make_run_id(**params)
+        with self._lock:
+            row = self._conn.execute("SELECT finished_at FROM runs WHERE run_id = ?", (self.run_id,)).fetchone()
+            if row is not None and row[0] is not None:
+                self._conn.execute("DELETE FROM run_pairs WHERE run_id = ?", (self.run_id,))
+                self._conn.execute("DELETE FROM runs WHERE run_id = ?", (self.run_id,))
+            self._conn.execute(
+                "INSERT OR IGNORE INTO runs (run_id, params, started_at) VALUES (?, ?, ?)",
+                (self.run_id, json.dumps(params, ensure_ascii=False, default=str), time.time())
+            )
+            self._conn.commit()
+        return self.run_id
+
+    def _require_run(self) -> str:
+        if self.run_id is None:
+            raise ValueError("Запуск не начат: вызовите start() или передайте run_id")
+        return self.run_id
+
+    def save_pair(self, user_id: int, quiz_id: int, attempts: Optional[List[QuizAttempt]],
+                  error: Optional[str] = None) -> None:
+        """
+        Сохраняет результат пары. attempts=None означает неудачную загрузку
+        """
+        run_id = self._require_run()
+        if attempts is None:
+            status, payload = STATUS_FAILED, None
+            error = error or 'нет ответа API'
+        else:
+            status = STATUS_OK
+            payload = json.dumps([[attempt.raw_grade, attempt.grade] for attempt in attempts])
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO run_pairs (run_id, userid, quizid, status, payload, error, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (run_id, user_id, quiz_id, status, payload, error, time.time())
+            )
+            self._conn.commit()
+
+    def completed(self) -> Dict[Tuple[int, int], List[QuizAttempt]]:
+        """
+        Успешно загруженные пары запуска с их попытками
+        """
+        run_id = self._require_run()
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT userid, quizid, payload FROM run_pairs WHERE run_id = ? AND status = ?",
+                (run_id, STATUS_OK)
+            ).fetchall()
+        return {
+            (user_id, quiz_id): [QuizAttempt(quiz_id, raw_grade, grade) for raw_grade, grade in json.loads(payload)]
+            for user_id, quiz_id, payload in rows
+        }
+
+    def failures(self) -> Dict[Tuple[int, int], str]:
+        """
+        Пары, загрузка которых завершилась ошибкой, и текст ошибки
+        """
+        run_id = self._require_run()
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT userid, quizid, error FROM run_pairs WHERE run_id = ? AND status = ?",
+                (run_id, STATUS_FAILED)
+            ).fetchall()
+        return {(user_id, quiz_id): error for user_id, quiz_id, error in rows}
+
+    def finish(self) -> None:
+        run_id = self._require_run()
+        with self._lock:
+            self._conn.execute("UPDATE runs SET finished_at = ? WHERE run_id = ?", (time.time(), run_id))
+            self._conn.commit()
+
+    def summary(self) -> Dict[str, int]:
+        run_id = self._require_run()
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT status, COUNT(*) FROM run_pairs WHERE run_id = ? GROUP BY status", (run_id,)
+            ).fetchall()
+        counts = {STATUS_OK: 0, STATUS_FAILED: 0}
+        counts.update(dict(rows))
+        return counts
+
+    def clear(self) -> None:
+        """
+        Удаляет сохраненные результаты запуска, чтобы начать его заново
+        """
+        run_id = self._require_run()
+        with self._lock:
+            self._conn.execute("DELETE FROM run_pairs WHERE run_id = ?", (run_id,))
+            self._conn.execute("DELETE FROM runs WHERE run_id = ?", (run_id,))
+            self._conn.commit()
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()